@@ -6,6 +6,8 @@ from os import getenv
 from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
+from models.base import Base
+from models.hashing import HashingBusy
 import os
 
 
@@ -14,6 +16,14 @@ app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 
 
+@app.before_request
+def sync_models():
+    """ Apply the changes other workers made to the model files
+    (MODEL_SHARED mode)
+    """
+    Base.sync_all()
+
+
 @app.errorhandler(404)
 def not_found(error) -> str:
     """ Not found handler
@@ -21,6 +31,14 @@ def not_found(error) -> str:
     return jsonify({"error": "Not found"}), 404
 
 
+@app.errorhandler(HashingBusy)
+def hashing_busy(error) -> str:
+    """ Password hashing queue full: retry later
+    """
+    return jsonify({"error": "Service unavailable"}), 503, \
+        {"Retry-After": "1"}
+
+
 if __name__ == "__main__":
     host = getenv("API_HOST", "0.0.0.0")
     port = getenv("API_PORT", "5000")
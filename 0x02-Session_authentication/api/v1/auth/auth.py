@@ -1,12 +1,28 @@
 #!/usr/bin/env python3
 
+import os
 from typing import List, TypeVar
 from flask import Flask, request
+from api.v1.auth.path_matcher import PathMatcher, compile_paths
 
 
 class Auth:
     ''' Class that handles API authentication.
     '''
+    # list given to exclude() and its matcher
+    _excluded_paths = None
+    _excluded = None
+
+    def exclude(
+            self,
+            excluded_paths: List[str]
+            ) -> None:
+        ''' Compiles, at setup, the paths that do not require
+        authentication: require_auth() given this same list then uses
+        the matcher as is (call exclude() again after changing the list).
+        '''
+        self._excluded_paths = excluded_paths
+        self._excluded = PathMatcher(excluded_paths)
 
     def require_auth(
             self,
@@ -18,35 +34,10 @@ class Auth:
         if path is None or excluded_paths is None or not excluded_paths:
             return True
 
-        # Remove trailing slash from paths if present
-        if path[-1] == '/':
-            path = path[:-1]
-
-        has_slash = False
-        for excluded_path in excluded_paths:
-            if excluded_path[-1] == '/':
-                excluded_path = excluded_path[:-1]
-                has_slash = True
-
-            if excluded_path.endswith('*'):
-                idx_after_last_slash = excluded_path.rfind('/') + 1
-                excluded = excluded_path[idx_after_last_slash:-1]
-
-                idx_after_last_slash = path.rfind('/') + 1
-                tmp_path = path[idx_after_last_slash:]
-
-                if excluded in tmp_path:
-                    return False
-
-            if has_slash:
-                has_slash = False
-
-        path += '/'
-
-        if path in excluded_paths:
-            return False
-
-        return True
+        # compiled once per list of excluded paths, results cached per path
+        if excluded_paths is self._excluded_paths:
+            return not self._excluded.match(path)
+        return not compile_paths(excluded_paths).match(path)
 
     def authorization_header(
             self,
@@ -59,6 +50,17 @@ class Auth:
 
         return request.headers.get('Authorization')
 
+    def session_cookie(
+            self,
+            request=None
+            ) -> str:
+        ''' Retrieves the session cookie, named by SESSION_NAME.
+        '''
+        if request is None:
+            return None
+
+        return request.cookies.get(os.getenv('SESSION_NAME'))
+
     def current_user(
             self,
             request=None
@@ -67,4 +69,3 @@ class Auth:
         '''
         request = Flask(__name__)
         return None
-
@@ -3,6 +3,8 @@
 import base64
 from typing import Tuple, TypeVar
 from api.v1.auth.auth import Auth
+from api.v1.auth.credential_cache import CredentialCache
+from models.hashing import HashingBusy
 from models.user import User
 
 
@@ -12,7 +14,12 @@ class BasicAuth(Auth):
     
     Args:
         Auth (class): Parent authentication class
+
+    Attributes:
+        credentials (CredentialCache): Headers already verified, shared by
+            the instances.
     """
+    credentials = CredentialCache()
 
     def extract_base64_authorization_header(
             self,
@@ -88,24 +95,36 @@ class BasicAuth(Auth):
             return None
 
         try:
-            users = User.search({'email': user_email})
+            for user in User.query().eq('email', user_email):
+                if user.is_valid_password(user_pwd):
+                    return user
+        except HashingBusy:
+            # overloaded, not wrong credentials: answered with a 503
+            raise
         except Exception:
             return None
 
-        for user in users:
-            if user.is_valid_password(user_pwd):
-                return user
-
         return None
 
     def current_user(self, request=None) -> TypeVar('User'):
-        """Returns the current user based on the request."""
+        """Returns the current user based on the request.
+
+        A header already verified is served from the credential cache,
+        without decoding it, looking the user up or hashing the password.
+        """
         try:
             auth_header = self.authorization_header(request)
+            user = self.credentials.get(auth_header)
+            if user is not None:
+                return user
             encoded = self.extract_base64_authorization_header(auth_header)
             decoded = self.decode_base64_authorization_header(encoded)
             email, password = self.extract_user_credentials(decoded)
-            return self.user_object_from_credentials(email, password)
+            user = self.user_object_from_credentials(email, password)
+            self.credentials.put(auth_header, user)
+            return user
+        except HashingBusy:
+            raise
         except Exception:
             return None
 
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Cache of verified Basic-auth credentials."""
+from collections import OrderedDict
+from os import getenv
+from threading import Lock
+from typing import Tuple, TypeVar
+import hashlib
+import os
+import time
+from models.user import User
+
+
+class CredentialCache:
+    """Bounded TTL cache mapping an Authorization header to the user it
+    was verified for.
+
+    Entries are keyed by a digest of the header under a key drawn per
+    process, so neither the header nor the password is ever stored. An
+    entry also records the email and stored password hash of the user
+    at verification time: a hit is only served while the user still
+    exists with the same email and password, so changing the password
+    (in this worker, or in another one when shared) or removing the user
+    invalidates every entry of that user.
+
+    Args:
+        max_size (int): Maximum number of entries, least recently used
+            evicted first (AUTH_CACHE_SIZE, default 1024).
+        ttl (float): Seconds an entry is served (AUTH_CACHE_TTL,
+            default 60). A size or TTL of 0 disables the cache.
+    """
+
+    def __init__(self, max_size: int = None, ttl: float = None):
+        if max_size is None:
+            max_size = int(getenv('AUTH_CACHE_SIZE', '1024'))
+        if ttl is None:
+            ttl = float(getenv('AUTH_CACHE_TTL', '60'))
+        self.max_size = max_size
+        self.ttl = ttl
+        self._key = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def digest(self, authorization_header: str) -> bytes:
+        """Keyed digest of an Authorization header.
+
+        Args:
+            authorization_header (str): The authorization header.
+
+        Returns:
+            bytes: 16 bytes identifying the header in this process.
+        """
+        return hashlib.blake2b(authorization_header.encode(),
+                               key=self._key, digest_size=16).digest()
+
+    @staticmethod
+    def _fingerprint(user: TypeVar('User')) -> Tuple[str, str]:
+        """State of a user a cached verification depends on."""
+        return user.email, user.password
+
+    def get(self, authorization_header: str) -> TypeVar('User'):
+        """Returns the user verified for a header, if still valid.
+
+        Args:
+            authorization_header (str): The authorization header.
+
+        Returns:
+            User: The cached user, or None (counted as a miss).
+        """
+        if not isinstance(authorization_header, str) or self.ttl <= 0:
+            return None
+        key = self.digest(authorization_header)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                user_id, fingerprint, expires = entry
+                user = User.get(user_id)
+                if expires > time.monotonic() and user is not None and \
+                        self._fingerprint(user) == fingerprint:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return user
+                del self._entries[key]
+            self.misses += 1
+        return None
+
+    def put(self, authorization_header: str, user: TypeVar('User')):
+        """Caches the user a header was verified for.
+
+        Args:
+            authorization_header (str): The authorization header.
+            user (User): The user its credentials are valid for.
+        """
+        if not isinstance(authorization_header, str) or user is None or \
+                self.ttl <= 0 or self.max_size <= 0:
+            return
+        key = self.digest(authorization_header)
+        entry = (user.id, self._fingerprint(user),
+                 time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str = None):
+        """Drops the entries of a user, or every entry.
+
+        Args:
+            user_id (str): The user whose entries are dropped (all if None).
+        """
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+                return
+            for key, entry in list(self._entries.items()):
+                if entry[0] == user_id:
+                    del self._entries[key]
+
+    def stats(self) -> dict:
+        """Returns the counters of the cache.
+
+        Returns:
+            dict: hits, misses, hit ratio and number of entries.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+            }
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+''' Excluded paths of Auth.require_auth, compiled once.
+
+Paths are compared with exactly one trailing slash, so "/api/v1/status"
+and "/api/v1/status/" are the same path. A pattern is:
+  - exact:  "/api/v1/status/"
+  - prefix: ending with "*", e.g. "/api/v1/stat*" (any path starting
+            with "/api/v1/stat"; "/api/v1/users/*" covers "/api/v1/users"
+            itself)
+  - glob:   "*" (any characters but "/") or "?" (one character but "/")
+            elsewhere, e.g. "/api/v1/users/*/profile"
+'''
+from functools import lru_cache
+from typing import Iterable, List
+import re
+
+
+def canonical(path: str) -> str:
+    ''' Path with exactly one trailing slash.
+    '''
+    return path.rstrip('/') + '/'
+
+
+class PathMatcher:
+    ''' Patterns compiled into a set (exact), a character trie (prefix)
+    and one regular expression (glob); results are cached per path.
+    '''
+    # key of the trie nodes where a prefix pattern ends
+    END = ''
+
+    def __init__(self, patterns: Iterable[str], cache_size: int = 4096):
+        ''' Compiles the patterns.
+        '''
+        self.exact = set()
+        self.trie = {}
+        globs = []
+        for pattern in patterns:
+            if not isinstance(pattern, str) or not pattern:
+                continue
+            if pattern.endswith('*') and \
+                    '*' not in pattern[:-1] and '?' not in pattern:
+                self._add_prefix(pattern[:-1])
+            elif '*' in pattern or '?' in pattern:
+                globs.append(self._glob(pattern))
+            else:
+                self.exact.add(canonical(pattern))
+        self.glob = re.compile('|'.join(globs)) if globs else None
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    def _add_prefix(self, prefix: str):
+        ''' Adds a prefix pattern to the trie.
+        '''
+        node = self.trie
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[self.END] = True
+
+    @staticmethod
+    def _glob(pattern: str) -> str:
+        ''' Regular expression of a glob pattern.
+        '''
+        prefix = pattern.endswith('*')
+        if prefix:
+            pattern = pattern[:-1]
+        else:
+            pattern = canonical(pattern)
+        regex = ''.join(
+            '[^/]*' if c == '*' else '[^/]' if c == '?' else re.escape(c)
+            for c in pattern)
+        return '(?:{}{})'.format(regex, '' if prefix else r'\Z')
+
+    def _match(self, path: str) -> bool:
+        ''' Checks if a path matches one of the patterns.
+        '''
+        path = canonical(path)
+        if path in self.exact:
+            return True
+        node = self.trie
+        for char in path:
+            if self.END in node:
+                return True
+            node = node.get(char)
+            if node is None:
+                break
+        else:
+            if self.END in node:
+                return True
+        return self.glob is not None and \
+            self.glob.match(path) is not None
+
+
+# tuple of patterns -> its matcher
+COMPILED = {}
+MAX_COMPILED = 32
+
+
+def compile_paths(patterns: List[str]) -> PathMatcher:
+    ''' Compiled matcher of a list of patterns, reused for any list
+    holding the same patterns. Building the key still reads the whole
+    list: Auth.exclude() compiles a list once for all.
+    '''
+    key = tuple(patterns)
+    matcher = COMPILED.get(key)
+    if matcher is None:
+        if len(COMPILED) >= MAX_COMPILED:
+            COMPILED.clear()
+        matcher = COMPILED[key] = PathMatcher(key)
+    return matcher
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Module for the Redis session backend: a RESP client with a connection
+pool and pipelining, for a Redis server or the session daemon.
+"""
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, List
+from urllib.parse import unquote, urlparse
+import os
+import socket
+import threading
+
+from .resp import NOT_READY, Reader, RespError, encode_command
+from .session_backend import SessionBackend
+
+
+class Connection:
+    """
+    One socket to the server, with its reply parser.
+
+    Args:
+        url (str): redis://[:password@]host[:port][/db] or unix://path.
+        timeout (float): Seconds a connect, send or receive may take.
+    """
+
+    def __init__(self, url: str, timeout: float = 1.0):
+        parsed = urlparse(url)
+        if parsed.scheme == 'unix':
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(parsed.netloc + parsed.path)
+        elif parsed.scheme == 'redis':
+            self.sock = socket.create_connection(
+                (parsed.hostname or 'localhost', parsed.port or 6379),
+                timeout)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            raise ValueError("Unsupported URL: {}".format(url))
+        self.reader = Reader()
+        setup = []
+        if parsed.password:
+            setup.append(('AUTH', unquote(parsed.password)))
+        db = parsed.path.strip('/') if parsed.scheme == 'redis' else ''
+        if db not in ('', '0'):
+            setup.append(('SELECT', db))
+        for reply in self.execute(setup):
+            if isinstance(reply, RespError):
+                self.close()
+                raise reply
+
+    def execute(self, commands: List[tuple]) -> List[Any]:
+        """
+        Sends commands in one write and reads their replies.
+
+        Args:
+            commands (list): Commands, as tuples of arguments.
+
+        Returns:
+            list: The replies, RespError instances for failed commands.
+        """
+        if not commands:
+            return []
+        self.sock.sendall(b''.join(encode_command(*c) for c in commands))
+        replies = []
+        while len(replies) < len(commands):
+            reply = self.reader.gets()
+            if reply is NOT_READY:
+                data = self.sock.recv(65536)
+                if not data:
+                    raise ConnectionError("connection closed by the server")
+                self.reader.feed(data)
+                continue
+            replies.append(reply)
+        return replies
+
+    def close(self) -> None:
+        """
+        Closes the socket.
+        """
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ConnectionPool:
+    """
+    At most `max_connections` connections, reused most recently released
+    first. Callers beyond that wait up to `timeout` seconds for one
+    (TimeoutError after that).
+
+    A forked child starts with an empty pool: the parent's sockets are
+    never used by two processes.
+    """
+
+    def __init__(self, url: str, max_connections: int = 8,
+                 timeout: float = 1.0):
+        self.url = url
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        """
+        Forgets every connection (new pool, or forked).
+        """
+        self._pid = os.getpid()
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self.created = 0
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        """
+        A connection of the pool, released on exit. It is closed instead
+        if the block raised anything but an error reply: it may be left
+        with unread replies.
+        """
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("no free connection to {}".format(self.url))
+        connection = None
+        try:
+            with self._lock:
+                if self._idle:
+                    connection = self._idle.pop()
+            if connection is None:
+                connection = Connection(self.url, self.timeout)
+                self.created += 1
+            yield connection
+        except BaseException as e:
+            if connection is not None and not isinstance(e, RespError):
+                connection.close()
+                connection = None
+            raise
+        finally:
+            if connection is not None:
+                with self._lock:
+                    self._idle.append(connection)
+            self._slots.release()
+
+    def execute(self, commands: List[tuple]) -> List[Any]:
+        """
+        Runs commands on a pooled connection, once more on a new one if
+        an idle connection turned out to be closed (server restarted).
+        """
+        for attempt in (1, 2):
+            try:
+                with self.connection() as connection:
+                    return connection.execute(commands)
+            except (ConnectionError, BrokenPipeError):
+                if attempt == 2:
+                    raise
+
+    def close(self) -> None:
+        """
+        Closes the idle connections.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def stats(self) -> dict:
+        """
+        Connections created, idle, and in use.
+        """
+        return {
+            'created': self.created,
+            'idle': len(self._idle),
+            'in_use': self.max_connections - self._slots._value,
+            'max_connections': self.max_connections,
+        }
+
+
+class Pipeline:
+    """
+    Commands queued and sent in one write on exit (or execute()), their
+    replies read together: one round trip for the lot.
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+        self.commands = []
+        self.replies = None
+
+    def command(self, *args: Any) -> 'Pipeline':
+        """
+        Queues a command.
+        """
+        self.commands.append(args)
+        return self
+
+    def execute(self) -> List[Any]:
+        """
+        Sends the queued commands and returns their replies.
+        """
+        commands, self.commands = self.commands, []
+        self.replies = self.pool.execute(commands)
+        return self.replies
+
+    def __enter__(self) -> 'Pipeline':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if exc_info[0] is None and self.commands:
+            self.execute()
+
+
+class RedisBackend(SessionBackend):
+    """
+    Sessions stored as `prefix + session ID` -> user ID keys of a Redis
+    server, expired by the server (SET ... PX), and so shared by every
+    process using the same server.
+
+    Args:
+        url (str): redis://[:password@]host[:port][/db] or unix://path.
+        prefix (str): Prefix of the keys (SESSION_KEY_PREFIX, default
+            "session:").
+        max_connections (int): Size of the pool (SESSION_POOL_SIZE,
+            default 8).
+        timeout (float): Seconds per operation (SESSION_BACKEND_TIMEOUT,
+            default 1).
+    """
+
+    def __init__(self, url: str, prefix: str = None,
+                 max_connections: int = None, timeout: float = None):
+        if prefix is None:
+            prefix = os.getenv('SESSION_KEY_PREFIX', 'session:')
+        if max_connections is None:
+            max_connections = int(os.getenv('SESSION_POOL_SIZE', '8'))
+        if timeout is None:
+            timeout = float(os.getenv('SESSION_BACKEND_TIMEOUT', '1'))
+        self.prefix = prefix
+        self.pool = ConnectionPool(url, max_connections, timeout)
+
+    def _key(self, session_id: str) -> str:
+        """
+        Key of a session.
+        """
+        return self.prefix + session_id
+
+    @staticmethod
+    def _check(reply: Any) -> Any:
+        """
+        Raises an error reply.
+        """
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    def pipeline(self) -> Pipeline:
+        """
+        A pipeline on the pool of this backend.
+        """
+        return Pipeline(self.pool)
+
+    def set(self, session_id: str, data: Any, ttl: float = None) -> None:
+        """
+        Stores the user ID of a session, expiring after `ttl` seconds.
+        """
+        command = ('SET', self._key(session_id), data)
+        if ttl is not None and ttl > 0:
+            command += ('PX', int(ttl * 1000))
+        self._check(self.pool.execute([command])[0])
+
+    def get(self, session_id: str, default: Any = None) -> Any:
+        """
+        Retrieves the user ID of a live session, or `default`.
+        """
+        if not isinstance(session_id, str):
+            return default
+        value = self._check(
+            self.pool.execute([('GET', self._key(session_id))])[0])
+        return default if value is None else value.decode()
+
+    def get_many(self, session_ids: Iterable[str]) -> List[Any]:
+        """
+        Retrieves the user IDs of several sessions in one round trip.
+        """
+        with self.pipeline() as pipeline:
+            for session_id in session_ids:
+                pipeline.command('GET', self._key(session_id))
+        return [None if v is None else self._check(v).decode()
+                for v in pipeline.replies or []]
+
+    def pop(self, session_id: str, default: Any = None) -> Any:
+        """
+        Removes a session, returning its user ID or `default`.
+        """
+        if not isinstance(session_id, str):
+            return default
+        key = self._key(session_id)
+        with self.pipeline() as pipeline:
+            pipeline.command('GET', key).command('DEL', key)
+        value = self._check(pipeline.replies[0])
+        return default if value is None else value.decode()
+
+    def stats(self) -> dict:
+        """
+        Pool counters.
+        """
+        return {'backend': 'redis', 'pool': self.pool.stats()}
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Module for the Redis serialization protocol (RESP 2), spoken by the
+session daemon and by the Redis session backend.
+"""
+from typing import Any, List, Union
+
+
+class RespError(Exception):
+    """
+    Error reply (-ERR ...), returned in place of a value by Reader.gets()
+    and raised by the client for a single command.
+    """
+
+
+class ProtocolError(Exception):
+    """
+    Malformed RESP data: the connection cannot be used any more.
+    """
+
+
+# returned by Reader.gets() until a whole value has been fed
+NOT_READY = object()
+
+# bulk strings above this size are refused (as Redis does by default)
+MAX_BULK = 512 * 1024 * 1024
+
+
+def encode(value: Any) -> bytes:
+    """
+    RESP form of a reply: None (null bulk string), int, str (simple
+    string), bytes (bulk string), RespError, or a list of those.
+    """
+    if value is None:
+        return b'$-1\r\n'
+    if type(value) is int:
+        return b':%d\r\n' % value
+    if type(value) is str:
+        return b'+%s\r\n' % value.encode()
+    if type(value) is bytes:
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+    if isinstance(value, RespError):
+        return b'-%s\r\n' % str(value).encode()
+    if isinstance(value, list):
+        return b'*%d\r\n' % len(value) + b''.join(encode(v) for v in value)
+    raise TypeError("cannot encode {}".format(type(value).__name__))
+
+
+def encode_command(*args: Union[bytes, str, int]) -> bytes:
+    """
+    RESP form of a command: an array of bulk strings.
+    """
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if type(arg) is str:
+            arg = arg.encode()
+        elif type(arg) is int:
+            arg = b'%d' % arg
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+class Reader:
+    """
+    Incremental RESP parser: feed() the bytes received, gets() the
+    values as soon as they are complete (NOT_READY until then).
+
+    Simple strings are returned as str, bulk strings as bytes, error
+    replies as RespError instances. Inline commands (a line of words, as
+    typed in telnet) are returned as a list of bytes.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty reader.
+        """
+        self._buffer = bytearray()
+        self._pos = 0
+
+    def feed(self, data: bytes) -> None:
+        """
+        Appends received bytes.
+        """
+        if self._pos > 65536 and self._pos * 2 > len(self._buffer):
+            # drop what has been parsed
+            del self._buffer[:self._pos]
+            self._pos = 0
+        self._buffer += data
+
+    def gets(self) -> Any:
+        """
+        Next complete value, or NOT_READY.
+        """
+        start = self._pos
+        value = self._value()
+        if value is NOT_READY:
+            self._pos = start
+        return value
+
+    def values(self) -> List[Any]:
+        """
+        Every complete value fed so far.
+        """
+        found = []
+        while True:
+            value = self.gets()
+            if value is NOT_READY:
+                return found
+            found.append(value)
+
+    def _number(self, start: int, end: int) -> int:
+        """
+        Integer between `start` and `end` of the buffer.
+        """
+        try:
+            return int(self._buffer[start:end])
+        except ValueError:
+            raise ProtocolError("invalid length or integer: {!r}".format(
+                bytes(self._buffer[start:end])))
+
+    def _value(self) -> Any:
+        """
+        Parses the value at the current position.
+        """
+        buffer = self._buffer
+        pos = self._pos
+        if pos >= len(buffer):
+            return NOT_READY
+        end = buffer.find(b'\r\n', pos)
+        if end < 0:
+            return NOT_READY
+        kind = buffer[pos]
+        if kind == 36:  # $ bulk string
+            number = self._number(pos + 1, end)
+            if number < 0:
+                self._pos = end + 2
+                return None
+            if number > MAX_BULK:
+                raise ProtocolError("bulk string too long")
+            start = end + 2
+            end = start + number
+            if end + 2 > len(buffer):
+                return NOT_READY
+            if buffer[end:end + 2] != b'\r\n':
+                raise ProtocolError("bulk string not terminated")
+            self._pos = end + 2
+            return bytes(buffer[start:end])
+        if kind == 42:  # * array
+            number = self._number(pos + 1, end)
+            self._pos = end + 2
+            if number < 0:
+                return None
+            items = []
+            for _ in range(number):
+                item = self._value()
+                if item is NOT_READY:
+                    return NOT_READY
+                items.append(item)
+            return items
+        self._pos = end + 2
+        if kind == 43:  # + simple string
+            return buffer[pos + 1:end].decode()
+        if kind == 45:  # - error
+            return RespError(buffer[pos + 1:end].decode())
+        if kind == 58:  # : integer
+            return self._number(pos + 1, end)
+        # inline command
+        return bytes(buffer[pos:end]).split()
@@ -2,18 +2,26 @@
 """
 Module for managing session-based authentication in the API.
 """
-from uuid import uuid4
+import sys
 from flask import request
 
 from .auth import Auth
+from .session_backend import session_backend
+from models.base import new_id
 from models.user import User
 
 
 class SessionAuth(Auth):
     """
     A class to handle session authentication.
+
+    Sessions are held by the backend chosen by SESSION_BACKEND, shared
+    by the instances: a SessionStore of this process by default, which
+    evicts expired sessions in the background and caps their number.
     """
-    user_id_by_session_id = {}
+    user_id_by_session_id = session_backend()
+    # seconds before a session expires (never if not positive)
+    session_duration = 0
 
     def create_session(self, user_id: str = None) -> str:
         """
@@ -26,8 +34,10 @@ class SessionAuth(Auth):
             str: The generated session ID, or None if the user ID is invalid.
         """
         if isinstance(user_id, str):
-            session_id = str(uuid4())
-            self.user_id_by_session_id[session_id] = user_id
+            session_id = new_id()
+            # one copy of the user ID for all the sessions of the user
+            self.user_id_by_session_id.set(session_id, sys.intern(user_id),
+                                           self.session_duration)
             return session_id
         return None
 
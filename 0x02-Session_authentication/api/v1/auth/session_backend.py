@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Module for the pluggable storage of the sessions of SessionAuth.
+
+    SESSION_BACKEND      memory (default): a SessionStore in each process
+                         redis: a Redis server, or the session daemon
+                         shipped with the API (see session_daemon), shared
+                         by every worker
+    SESSION_BACKEND_URL  redis://[:password@]host[:port][/db] or
+                         unix://path of the socket (default:
+                         unix://.sessions.sock, the daemon's default)
+"""
+from abc import ABC, abstractmethod
+import os
+from typing import Any, Iterable, List
+
+
+DEFAULT_URL = 'unix://.sessions.sock'
+
+
+class SessionBackend(ABC):
+    """
+    Storage of session data (the user ID) by session ID, with expiry.
+    Backends implement set, get and pop.
+    """
+
+    @abstractmethod
+    def set(self, session_id: str, data: Any, ttl: float = None) -> None:
+        """
+        Stores the data of a session.
+
+        Args:
+            session_id (str): The session ID.
+            data: The session data.
+            ttl (float): Seconds before the session expires (never if None
+                or not positive).
+        """
+
+    @abstractmethod
+    def get(self, session_id: str, default: Any = None) -> Any:
+        """
+        Retrieves the data of a live session, or `default`.
+        """
+
+    def get_many(self, session_ids: Iterable[str]) -> List[Any]:
+        """
+        Retrieves the data of several sessions (None for unknown or
+        expired ones), in one round trip for a remote backend.
+        """
+        return [self.get(session_id) for session_id in session_ids]
+
+    @abstractmethod
+    def pop(self, session_id: str, default: Any = None) -> Any:
+        """
+        Removes a session, returning its data or `default`.
+        """
+
+    def __setitem__(self, session_id: str, data: Any) -> None:
+        """
+        Stores the data of a session that never expires.
+        """
+        self.set(session_id, data)
+
+    def stats(self) -> dict:
+        """
+        Counters of the backend.
+        """
+        return {}
+
+
+def session_backend(name: str = None, url: str = None) -> SessionBackend:
+    """
+    Backend named by SESSION_BACKEND, at SESSION_BACKEND_URL.
+
+    Args:
+        name (str): 'memory' or 'redis' (SESSION_BACKEND by default).
+        url (str): Address of a redis backend (SESSION_BACKEND_URL by
+            default).
+
+    Returns:
+        SessionBackend: A new backend.
+    """
+    if name is None:
+        name = os.getenv('SESSION_BACKEND', 'memory')
+    if name == 'memory':
+        from .session_store import SessionStore
+        return SessionStore()
+    if name == 'redis':
+        from .redis_backend import RedisBackend
+        return RedisBackend(url or os.getenv('SESSION_BACKEND_URL',
+                                             DEFAULT_URL))
+    raise ValueError("Unknown session backend: {}".format(name))
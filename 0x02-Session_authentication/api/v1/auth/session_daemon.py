@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Module for the session daemon: a SessionStore served over a Unix socket
+in the Redis protocol, so that every worker of the API sees the same
+sessions (SESSION_BACKEND=redis, see session_backend).
+
+    python3 -m api.v1.auth.session_daemon [--socket .sessions.sock]
+
+It implements the commands the Redis backend uses, and a few to inspect
+it: PING, GET, MGET, SET key value [EX seconds | PX milliseconds],
+DEL, EXISTS, DBSIZE, FLUSHDB, INFO, SELECT 0, QUIT. Pipelined commands
+are answered in one write.
+"""
+from typing import Any, List
+import argparse
+import asyncio
+import os
+import signal
+
+from .resp import ProtocolError, Reader, RespError, encode
+from .session_store import SessionStore
+
+
+COMMANDS = ('PING', 'GET', 'MGET', 'SET', 'DEL', 'EXISTS', 'DBSIZE',
+            'FLUSHDB', 'INFO', 'SELECT', 'QUIT')
+
+
+class SessionDaemon:
+    """
+    Executes the commands of the clients on one SessionStore.
+    """
+
+    def __init__(self, store: SessionStore = None):
+        self.store = SessionStore() if store is None else store
+        self.commands = 0
+        self.clients = 0
+        self._writers = set()
+
+    def execute(self, command: List[Any]) -> Any:
+        """
+        Reply to one command (a list of bytes).
+        """
+        if not isinstance(command, list) or not command or \
+                not all(type(arg) is bytes for arg in command):
+            return RespError("ERR commands are arrays of bulk strings")
+        self.commands += 1
+        name = command[0].decode('ascii', 'replace').upper()
+        args = command[1:]
+        if name not in COMMANDS:
+            return RespError("ERR unknown command '{}'".format(name))
+        handler = getattr(self, '_' + name.lower())
+        try:
+            return handler(*args)
+        except TypeError:
+            return RespError("ERR wrong number of arguments for '{}'"
+                             .format(name.lower()))
+        except ValueError:
+            return RespError("ERR value is not an integer or out of range")
+
+    def _ping(self, message: bytes = None) -> Any:
+        """
+        PING [message]
+        """
+        return 'PONG' if message is None else message
+
+    def _get(self, key: bytes) -> Any:
+        """
+        GET key: value, or nil
+        """
+        return self.store.get(key)
+
+    def _mget(self, *keys: bytes) -> List[Any]:
+        """
+        MGET key [key ...]: values, nil for missing keys
+        """
+        if not keys:
+            raise TypeError
+        return [self.store.get(key) for key in keys]
+
+    def _set(self, key: bytes, value: bytes, *options: bytes) -> Any:
+        """
+        SET key value [EX seconds | PX milliseconds]
+        """
+        ttl = None
+        if options:
+            if len(options) != 2 or options[0].upper() not in (b'EX',
+                                                               b'PX'):
+                return RespError("ERR syntax error")
+            ttl = int(options[1])
+            if ttl <= 0:
+                return RespError("ERR invalid expire time in 'set'")
+            if options[0].upper() == b'PX':
+                ttl = ttl / 1000
+        self.store.set(key, value, ttl)
+        return 'OK'
+
+    def _del(self, *keys: bytes) -> int:
+        """
+        DEL key [key ...]: number of keys removed
+        """
+        if not keys:
+            raise TypeError
+        return sum(self.store.pop(key, None) is not None for key in keys)
+
+    def _exists(self, *keys: bytes) -> int:
+        """
+        EXISTS key [key ...]: number of live keys
+        """
+        if not keys:
+            raise TypeError
+        return sum(key in self.store for key in keys)
+
+    def _dbsize(self) -> int:
+        """
+        DBSIZE: number of live keys
+        """
+        return self.store.stats()['live']
+
+    def _flushdb(self) -> str:
+        """
+        FLUSHDB: removes every key
+        """
+        self.store.clear()
+        return 'OK'
+
+    def _select(self, db: bytes) -> Any:
+        """
+        SELECT 0 (the only database)
+        """
+        if int(db) != 0:
+            return RespError("ERR DB index is out of range")
+        return 'OK'
+
+    def _info(self, *sections: bytes) -> bytes:
+        """
+        INFO: counters of the store and of the daemon
+        """
+        stats = dict(self.store.stats(), commands=self.commands,
+                     clients=self.clients)
+        return "".join("{}:{}\r\n".format(k, v)
+                       for k, v in stats.items()).encode()
+
+    def _quit(self) -> str:
+        """
+        QUIT: closes the connection after the reply
+        """
+        return 'OK'
+
+    async def serve_client(self, reader: asyncio.StreamReader,
+                           writer: asyncio.StreamWriter) -> None:
+        """
+        Answers the commands of one client until it disconnects.
+        """
+        self.clients += 1
+        self._writers.add(writer)
+        parser = Reader()
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    return
+                parser.feed(data)
+                try:
+                    commands = parser.values()
+                except ProtocolError as e:
+                    writer.write(encode(RespError("ERR Protocol error: {}"
+                                                  .format(e))))
+                    return
+                writer.write(b''.join(encode(self.execute(c))
+                                      for c in commands))
+                if any(isinstance(c, list) and c and type(c[0]) is bytes
+                       and c[0].upper() == b'QUIT' for c in commands):
+                    return
+                await writer.drain()
+        except ConnectionError:
+            return
+        finally:
+            self.clients -= 1
+            self._writers.discard(writer)
+            writer.close()
+
+    async def serve(self, socket_path: str) -> None:
+        """
+        Serves clients on a Unix socket (only the owner may connect)
+        until SIGINT or SIGTERM.
+        """
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        old_umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self.serve_client,
+                                                     socket_path)
+        finally:
+            os.umask(old_umask)
+        stop = asyncio.get_running_loop().create_future()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            asyncio.get_running_loop().add_signal_handler(
+                signum, lambda: stop.done() or stop.set_result(None))
+        try:
+            async with server:
+                await stop
+                # end of stream for the clients still connected: their
+                # handlers return instead of being cancelled
+                for writer in list(self._writers):
+                    writer.close()
+                while self._writers:
+                    await asyncio.sleep(0.01)
+        finally:
+            self.store.stop()
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python3 -m api.v1.auth.session_daemon",
+        description="Session store shared by the API workers")
+    parser.add_argument('--socket', default='.sessions.sock',
+                        help="path of the Unix socket "
+                        "(default: .sessions.sock)")
+    parser.add_argument('--max-sessions', type=int, default=None,
+                        help="cap of the number of sessions "
+                        "(default: SESSION_MAX or 100000)")
+    args = parser.parse_args(argv)
+    daemon = SessionDaemon(SessionStore(args.max_sessions))
+    asyncio.run(daemon.serve(args.socket))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
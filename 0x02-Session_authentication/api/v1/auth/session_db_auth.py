@@ -12,6 +12,10 @@ from .session_exp_auth import SessionExpAuth
 class SessionDBAuth(SessionExpAuth):
     """
     Handles session authentication with expiration and database storage.
+
+    Sessions are found through the session_id index of UserSession and
+    written as journal lines, so logins and lookups cost the same however
+    many sessions are stored.
     """
 
     def create_session(self, user_id=None) -> str:
@@ -42,18 +46,21 @@ class SessionDBAuth(SessionExpAuth):
             str: The user ID associated with the session ID, or None if expired or not found.
         """
         try:
-            sessions = UserSession.search({'session_id': session_id})
+            session = UserSession.by_session_id(session_id)
         except Exception:
             return None
 
-        if not sessions:
+        if session is None:
             return None
 
-        session = sessions[0]
-        cur_time = datetime.now()
-        exp_time = session.created_at + timedelta(seconds=self.session_duration)
+        if self.session_duration <= 0:
+            return session.user_id
 
-        if cur_time > exp_time:
+        # created_at is stored in UTC
+        exp_time = session.created_at + timedelta(seconds=self.session_duration)
+        if datetime.utcnow() > exp_time:
+            # expired for good: drop it from the database
+            session.remove()
             return None
 
         return session.user_id
@@ -73,13 +80,13 @@ class SessionDBAuth(SessionExpAuth):
             return False
 
         try:
-            sessions = UserSession.search({'session_id': session_id})
+            session = UserSession.by_session_id(session_id)
         except Exception:
             return False
 
-        if not sessions:
+        if session is None:
             return False
 
-        sessions[0].remove()
+        self.user_id_by_session_id.pop(session_id, None)
+        session.remove()
         return True
-
@@ -4,7 +4,6 @@ Module for session authentication with expiration.
 """
 import os
 from flask import request
-from datetime import datetime, timedelta
 
 from .session_auth import SessionAuth
 
@@ -29,7 +28,7 @@ class SessionExpAuth(SessionAuth):
 
     def create_session(self, user_id=None):
         """
-        Creates a session ID for the specified user and records its creation time.
+        Creates a session ID for the specified user and records its expiry time.
 
         Args:
             user_id (str): The ID of the user to associate with the session.
@@ -37,15 +36,9 @@ class SessionExpAuth(SessionAuth):
         Returns:
             str: The created session ID, or None if invalid.
         """
-        session_id = super().create_session(user_id)
-        if not isinstance(session_id, str):
-            return None
-
-        self.user_id_by_session_id[session_id] = {
-            'user_id': user_id,
-            'created_at': datetime.now(),
-        }
-        return session_id
+        # stored once, expired by the backend session_duration seconds
+        # from now (monotonic clock)
+        return super().create_session(user_id)
 
     def user_id_for_session_id(self, session_id=None) -> str:
         """
@@ -59,23 +52,5 @@ class SessionExpAuth(SessionAuth):
             str: The user ID if the session is valid and not expired, 
             or None otherwise.
         """
-        session_data = self.user_id_by_session_id.get(session_id)
-        if not session_data:
-            return None
-
-        # Check if the session duration is set; if not, return the user ID.
-        if self.session_duration <= 0:
-            return session_data['user_id']
-
-        # Ensure 'created_at' exists in the session data.
-        created_at = session_data.get('created_at')
-        if not created_at:
-            return None
-
-        # Check if the session has expired.
-        expiration_time = created_at + timedelta(seconds=self.session_duration)
-        if datetime.now() > expiration_time:
-            return None
-
-        return session_data['user_id']
-
+        # None once expired: the store checks the expiry time
+        return self.user_id_by_session_id.get(session_id)
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Module for the in-memory session store of session authentication.
+"""
+from collections import OrderedDict
+from typing import Any, Iterator, List
+import heapq
+import os
+import threading
+import time
+
+from .session_backend import SessionBackend
+
+
+def session_key(session_id: Any) -> Any:
+    """
+    Key of a session ID in the store: the 16 bytes of a lowercase UUID
+    string as str(uuid4()) writes it (49 bytes of memory instead of 85),
+    any other ID unchanged, so that IDs stay case-sensitive.
+    """
+    if type(session_id) is str and len(session_id) == 36 and \
+            session_id[8] == session_id[13] == session_id[18] == \
+            session_id[23] == '-' and session_id == session_id.lower():
+        try:
+            key = bytes.fromhex(session_id.replace('-', ''))
+        except ValueError:
+            return session_id
+        if len(key) == 16:
+            return key
+    return session_id
+
+
+def session_id_of(key: Any) -> Any:
+    """
+    Session ID of a key of the store.
+    """
+    if type(key) is bytes:
+        h = key.hex()
+        return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+    return key
+
+
+def heap_item(expires: int, key: Any) -> tuple:
+    """
+    Entry of the expiry heap: (expiry time, key), with b'' in between for
+    a key that is not bytes, so that keys of both types never get
+    compared on equal expiry times.
+    """
+    if type(key) is bytes:
+        return expires, key
+    return expires, b'', key
+
+
+class SessionStore(SessionBackend):
+    """
+    Mapping of session IDs to session data, with expiry and a size cap:
+    the session backend of a single process (SESSION_BACKEND=memory).
+
+    Entries are compact: a UUID session ID is held as its 16 bytes (see
+    session_key) and its expiry time as integer nanoseconds of the
+    monotonic clock, next to the data.
+
+    Sessions created with a TTL are also pushed on a heap ordered by
+    expiry time. A background thread pops the expired ones every
+    `sweep_interval` seconds, `sweep_batch` at a time, so that requests
+    never pay for the eviction; a lookup only checks the expiry of the
+    session it reads.
+
+    Past `max_sessions` (SESSION_MAX, default 100000; 0 for no cap), the
+    least recently used sessions are evicted, expired or not.
+
+    The sweeper starts with the first session stored with a TTL, and again
+    in a forked child.
+    """
+
+    def __init__(self, max_sessions: int = None,
+                 sweep_interval: float = None, sweep_batch: int = 1000):
+        """
+        Initializes an empty store.
+
+        Args:
+            max_sessions (int): Cap of the number of sessions.
+            sweep_interval (float): Seconds between two sweeps
+                (SESSION_SWEEP_INTERVAL, default 1).
+            sweep_batch (int): Sessions evicted per lock acquisition.
+        """
+        if max_sessions is None:
+            max_sessions = int(os.getenv('SESSION_MAX', '100000'))
+        if sweep_interval is None:
+            sweep_interval = float(os.getenv('SESSION_SWEEP_INTERVAL', '1'))
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self._lock = threading.RLock()
+        # session key -> (data, expiry time or None), least recently used
+        # first
+        self._sessions = OrderedDict()
+        # (expiry time, session key); entries of sessions removed or stored
+        # again are left behind and skipped
+        self._expiries = []
+        self._sweeper = None
+        self._pid = os.getpid()
+        self._stop = threading.Event()
+        self.swept = 0
+        self.evicted = 0
+
+    @staticmethod
+    def now() -> int:
+        """
+        Clock of the expiry times, in nanoseconds: monotonic, unaffected
+        by clock steps.
+        """
+        return time.monotonic_ns()
+
+    def set(self, session_id: str, data: Any, ttl: float = None) -> None:
+        """
+        Stores the data of a session.
+
+        Args:
+            session_id (str): The session ID.
+            data: The session data (e.g. the user ID).
+            ttl (float): Seconds before the session expires (never if None
+                or not positive).
+        """
+        if ttl is not None and ttl > 0:
+            expires = self.now() + int(ttl * 1000000000)
+        else:
+            expires = None
+        session_id = session_key(session_id)
+        with self._lock:
+            self._sessions[session_id] = (data, expires)
+            self._sessions.move_to_end(session_id)
+            if expires is not None:
+                heapq.heappush(self._expiries,
+                               heap_item(expires, session_id))
+                if 2 * len(self._sessions) + 1024 < len(self._expiries):
+                    self._compact()
+            if 0 < self.max_sessions < len(self._sessions):
+                self._evict(len(self._sessions) - self.max_sessions)
+        if expires is not None:
+            self._start_sweeper()
+
+    def get(self, session_id: str, default: Any = None) -> Any:
+        """
+        Retrieves the data of a session.
+
+        Args:
+            session_id (str): The session ID.
+            default: Returned for an unknown or expired session.
+
+        Returns:
+            The session data, or `default`.
+        """
+        # single OrderedDict operations are atomic: no lock on the
+        # request path
+        session_id = session_key(session_id)
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return default
+        if entry[1] is not None and entry[1] <= time.monotonic_ns():
+            # left for the sweeper
+            return default
+        try:
+            self._sessions.move_to_end(session_id)
+        except KeyError:
+            # removed meanwhile
+            return default
+        return entry[0]
+
+    def pop(self, session_id: str, default: Any = None) -> Any:
+        """
+        Removes a session.
+
+        Args:
+            session_id (str): The session ID.
+            default: Returned for an unknown session.
+
+        Returns:
+            The data of the session, or `default`.
+        """
+        session_id = session_key(session_id)
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        return default if entry is None else entry[0]
+
+    def __getitem__(self, session_id: str) -> Any:
+        """
+        Retrieves the data of a live session (KeyError if none).
+        """
+        entry = self.get(session_id, KeyError)
+        if entry is KeyError:
+            raise KeyError(session_id)
+        return entry
+
+    def __delitem__(self, session_id: str) -> None:
+        """
+        Removes a session (KeyError if unknown).
+        """
+        with self._lock:
+            del self._sessions[session_key(session_id)]
+
+    def __contains__(self, session_id: str) -> bool:
+        """
+        Checks if a session is live.
+        """
+        return self.get(session_id, KeyError) is not KeyError
+
+    def __len__(self) -> int:
+        """
+        Number of sessions held, including expired ones not swept yet.
+        """
+        return len(self._sessions)
+
+    def __iter__(self) -> Iterator[str]:
+        """
+        IDs of the sessions held.
+        """
+        with self._lock:
+            return iter([session_id_of(k) for k in self._sessions])
+
+    def clear(self) -> None:
+        """
+        Removes every session.
+        """
+        with self._lock:
+            self._sessions.clear()
+            self._expiries = []
+
+    def _is_current(self, item: tuple) -> bool:
+        """
+        Checks if a heap entry still holds the expiry of its session.
+        """
+        entry = self._sessions.get(item[-1])
+        return entry is not None and entry[1] == item[0]
+
+    def _compact(self) -> None:
+        """
+        Rebuilds the heap without the entries left behind.
+        """
+        self._expiries = [heap_item(entry[1], session_id)
+                          for session_id, entry in self._sessions.items()
+                          if entry[1] is not None]
+        heapq.heapify(self._expiries)
+
+    def _evict(self, count: int) -> None:
+        """
+        Removes the `count` least recently used sessions.
+        """
+        for _ in range(count):
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def sweep(self, limit: int = None) -> int:
+        """
+        Removes expired sessions, earliest expiry first.
+
+        Args:
+            limit (int): Maximum number of heap entries to pop (all the
+                expired ones if None).
+
+        Returns:
+            int: The number of heap entries popped.
+        """
+        popped = 0
+        now = self.now()
+        with self._lock:
+            expiries = self._expiries
+            while expiries and expiries[0][0] <= now and \
+                    (limit is None or popped < limit):
+                item = heapq.heappop(expiries)
+                popped += 1
+                if self._is_current(item):
+                    del self._sessions[item[-1]]
+                    self.swept += 1
+        return popped
+
+    def _sweep_forever(self) -> None:
+        """
+        Body of the sweeper thread.
+        """
+        while not self._stop.wait(self.sweep_interval):
+            # one batch per lock acquisition: requests wait one batch
+            while self.sweep(self.sweep_batch) == self.sweep_batch:
+                pass
+
+    def _start_sweeper(self) -> None:
+        """
+        Starts the sweeper thread of this process, if not running.
+        """
+        if self._sweeper is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # forked: the parent's thread does not exist here
+                self._pid = os.getpid()
+                self._sweeper = None
+                self._stop = threading.Event()
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(
+                    target=self._sweep_forever, name='session-sweeper',
+                    daemon=True)
+                self._sweeper.start()
+
+    def stop(self) -> None:
+        """
+        Stops the sweeper thread (started again by the next session).
+        """
+        with self._lock:
+            if self._sweeper is not None and self._pid == os.getpid():
+                self._stop.set()
+                self._sweeper.join()
+            self._sweeper = None
+            self._stop = threading.Event()
+
+    def _expired(self) -> List[str]:
+        """
+        Keys of the expired sessions not swept yet: the heap is walked
+        from its root through the expired entries only.
+        """
+        now = self.now()
+        expiries = self._expiries
+        found = []
+        stack = [0] if expiries else []
+        while stack:
+            i = stack.pop()
+            if i >= len(expiries) or expiries[i][0] > now:
+                continue
+            if self._is_current(expiries[i]):
+                found.append(expiries[i][-1])
+            stack.extend((2 * i + 1, 2 * i + 2))
+        return found
+
+    def stats(self) -> dict:
+        """
+        Counters of the store.
+
+        Returns:
+            dict: live and expired (not swept yet) sessions, sessions
+            swept and evicted by the cap since the start, and the cap.
+        """
+        with self._lock:
+            expired = len(self._expired())
+            return {
+                'live': len(self._sessions) - expired,
+                'expired': expired,
+                'swept': self.swept,
+                'evicted': self.evicted,
+                'max_sessions': self.max_sessions,
+            }
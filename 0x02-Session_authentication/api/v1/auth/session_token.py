@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Module for signed session tokens: what SessionTokenAuth hands out in
+place of a session ID, verified without any session store.
+
+A token is the URL-safe base64 (unpadded) of
+
+    version (1 byte) | key ID (1) | flags (1) | expiry (4) |
+    generation (4) | user ID | HMAC-SHA256 of all that, truncated (16)
+
+The expiry is in Unix seconds (0: never) since tokens are checked by
+other processes than the one that issued them. A UUID user ID takes its
+16 bytes (flag 1), any other its UTF-8 form.
+"""
+from typing import Dict, Optional, Tuple
+import base64
+import binascii
+import hmac
+import os
+import struct
+import time
+
+from .session_store import session_id_of, session_key
+
+
+VERSION = 1
+HEADER = struct.Struct('>BBBII')
+TAG_SIZE = 16
+FLAG_UUID = 1
+
+
+class TokenSigner:
+    """
+    Signs and verifies session tokens with rotating keys.
+
+    Keys come from SESSION_TOKEN_KEYS, "id:secret" pairs separated by
+    commas, the first one signing and every one verifying: rotating a key
+    means putting the new one first and keeping the previous one until
+    the tokens it signed expire. Without it, a random key is drawn, valid
+    for this process and the workers forked from it.
+
+    Args:
+        keys (dict): Key ID (0-255) -> secret, instead of the environment.
+        current (int): ID of the signing key (the first one by default).
+    """
+
+    def __init__(self, keys: Dict[int, bytes] = None, current: int = None):
+        if keys is None:
+            keys = {}
+            for pair in filter(None, os.getenv('SESSION_TOKEN_KEYS',
+                                               '').split(',')):
+                key_id, _, secret = pair.strip().partition(':')
+                if current is None:
+                    current = int(key_id)
+                keys[int(key_id)] = secret.encode()
+        if not keys:
+            keys = {0: os.urandom(32)}
+        if current is None:
+            current = next(iter(keys))
+        self.keys = {}
+        for key_id, secret in keys.items():
+            self.add_key(key_id, secret)
+        if current not in self.keys:
+            raise ValueError("Unknown signing key: {}".format(current))
+        self.current = current
+
+    def add_key(self, key_id: int, secret: bytes) -> None:
+        """
+        Accepts the tokens signed with a key.
+
+        Args:
+            key_id (int): ID of the key, 0 to 255.
+            secret (bytes): The key, 32 bytes or more.
+        """
+        if not 0 <= key_id <= 255:
+            raise ValueError("Key IDs range from 0 to 255")
+        if len(secret) < 32:
+            raise ValueError("Keys need 32 bytes or more")
+        self.keys[key_id] = secret
+
+    def rotate(self, key_id: int, secret: bytes) -> None:
+        """
+        Signs with a new key from now on, still accepting the others.
+        """
+        self.add_key(key_id, secret)
+        self.current = key_id
+
+    def retire(self, key_id: int) -> None:
+        """
+        Stops accepting the tokens signed with a key.
+        """
+        if key_id == self.current:
+            raise ValueError("The signing key cannot be retired")
+        self.keys.pop(key_id, None)
+
+    def sign(self, user_id: str, ttl: int = 0, generation: int = 0) -> str:
+        """
+        Token of a user.
+
+        Args:
+            user_id (str): The ID of the user.
+            ttl (int): Seconds before the token expires (never if not
+                positive).
+            generation (int): Session generation of the user.
+
+        Returns:
+            str: The token.
+        """
+        key = session_key(user_id)
+        if type(key) is bytes:
+            flags = FLAG_UUID
+        else:
+            flags = 0
+            key = user_id.encode()
+        expires = int(time.time()) + ttl if ttl > 0 else 0
+        payload = HEADER.pack(VERSION, self.current, flags, expires,
+                              generation) + key
+        tag = hmac.digest(self.keys[self.current], payload,
+                          'sha256')[:TAG_SIZE]
+        return base64.urlsafe_b64encode(payload + tag).rstrip(b'=').decode()
+
+    def verify(self, token: str) -> Optional[Tuple[str, int]]:
+        """
+        User ID and session generation of a token, if it is authentic,
+        signed by a known key and not expired (None otherwise).
+        """
+        if not isinstance(token, str) or len(token) > 512:
+            return None
+        try:
+            data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        except (binascii.Error, ValueError):
+            return None
+        if len(data) < HEADER.size + TAG_SIZE + 1:
+            return None
+        payload, tag = data[:-TAG_SIZE], data[-TAG_SIZE:]
+        version, key_id, flags, expires, generation = \
+            HEADER.unpack_from(payload)
+        secret = self.keys.get(key_id)
+        if version != VERSION or secret is None:
+            return None
+        if not hmac.compare_digest(
+                hmac.digest(secret, payload, 'sha256')[:TAG_SIZE], tag):
+            return None
+        if expires and expires <= time.time():
+            return None
+        user_id = payload[HEADER.size:]
+        if flags & FLAG_UUID:
+            if len(user_id) != 16:
+                return None
+            return session_id_of(user_id), generation
+        try:
+            return user_id.decode(), generation
+        except UnicodeDecodeError:
+            return None
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Module for session authentication by signed, expiring tokens.
+"""
+import os
+from typing import TypeVar
+
+from .auth import Auth
+from .session_token import TokenSigner
+from models.user import User
+
+
+class SessionTokenAuth(Auth):
+    """
+    Session authentication without a session store: the session cookie
+    holds a token signed by the API (see session_token), carrying the
+    user ID, an expiry time and the session generation of the user.
+
+    A request costs a signature check and the User.get it needs anyway.
+    Logging out moves the user to the next generation, which revokes all
+    the tokens issued to that user so far.
+    """
+    signer = None
+
+    def __init__(self) -> None:
+        """
+        Initializes the instance with the session duration (seconds,
+        SESSION_DURATION, 0 for tokens that never expire) and the signing
+        keys (SESSION_TOKEN_KEYS), shared by the instances.
+        """
+        super().__init__()
+        try:
+            self.session_duration = int(os.getenv('SESSION_DURATION', '0'))
+        except ValueError:
+            self.session_duration = 0
+        if SessionTokenAuth.signer is None:
+            SessionTokenAuth.signer = TokenSigner()
+
+    def create_session(self, user_id: str = None) -> str:
+        """
+        Issues a token for a user.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            str: The token, or None if there is no such user.
+        """
+        if not isinstance(user_id, str):
+            return None
+        user = User.get(user_id)
+        if user is None:
+            return None
+        return self.signer.sign(user_id, self.session_duration,
+                                user.session_generation)
+
+    def user_id_for_session_id(self, session_id: str = None) -> str:
+        """
+        Retrieves the user ID of a token, without checking revocation.
+
+        Args:
+            session_id (str): The token.
+
+        Returns:
+            str: The user ID if the token is authentic and not expired,
+            or None otherwise.
+        """
+        claims = self.signer.verify(session_id)
+        return None if claims is None else claims[0]
+
+    def _user_for_token(self, token: str) -> TypeVar('User'):
+        """
+        User of a valid token of the current generation, or None.
+        """
+        claims = self.signer.verify(token)
+        if claims is None:
+            return None
+        user = User.get(claims[0])
+        if user is None or user.session_generation != claims[1]:
+            return None
+        return user
+
+    def current_user(self, request=None) -> TypeVar('User'):
+        """
+        Fetches the User object of the token in the session cookie.
+
+        Args:
+            request (Request): The HTTP request containing the cookie.
+
+        Returns:
+            User: The user, or None if the token is invalid, expired or
+            revoked.
+        """
+        return self._user_for_token(self.session_cookie(request))
+
+    def destroy_session(self, request=None) -> bool:
+        """
+        Logs the user of the request out: revokes every token issued to
+        the user.
+
+        Args:
+            request (Request): The HTTP request containing the cookie.
+
+        Returns:
+            bool: True if a valid session was ended, False otherwise.
+        """
+        if request is None:
+            return False
+        user = self._user_for_token(self.session_cookie(request))
+        if user is None:
+            return False
+        user.revoke_sessions()
+        return True
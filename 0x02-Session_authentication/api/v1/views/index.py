@@ -19,8 +19,16 @@ def stats() -> str:
     """ GET /api/v1/stats
     Return:
       - the number of each objects
+      - the counters of each model (see Base.stats)
+      - the hit/miss counters of the Basic-auth credential cache
+      - the live/expired counts of the session store
     """
+    from api.v1.auth.basic_auth import BasicAuth
+    from api.v1.auth.session_auth import SessionAuth
     from models.user import User
     stats = {}
     stats['users'] = User.count()
+    stats['models'] = {'User': User.stats()}
+    stats['auth'] = {'basic': BasicAuth.credentials.stats(),
+                     'sessions': SessionAuth.user_id_by_session_id.stats()}
     return jsonify(stats)
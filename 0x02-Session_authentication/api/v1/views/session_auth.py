@@ -34,20 +34,20 @@ def login() -> Tuple[str, int]:
 
     # Attempt to find the user in the database using the provided email.
     try:
-        users = User.search({'email': email})
+        user = User.query().eq('email', email).first()
     except Exception:
         return jsonify(not_found_res), 404
 
-    # Check if any user was found with the given email.
-    if not users:
+    # Check if a user was found with the given email.
+    if user is None:
         return jsonify(not_found_res), 404
 
     # Verify the provided password for the found user.
-    if users[0].is_valid_password(password):
+    if user.is_valid_password(password):
         # Create a session for the user and set it in the response cookie.
         from api.v1.app import auth
-        session_id = auth.create_session(getattr(users[0], 'id'))
-        response = jsonify(users[0].to_json())
+        session_id = auth.create_session(getattr(user, 'id'))
+        response = jsonify(user.to_json())
         response.set_cookie(os.getenv("SESSION_NAME"), session_id)
         return response
 
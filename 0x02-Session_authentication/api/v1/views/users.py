@@ -2,18 +2,55 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request
 from models.user import User
+from urllib.parse import urlencode
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - sort: created_at, updated_at or email ('-' prefix: descending)
+      - limit: page size
+      - cursor: value of the previous page 'next' link
     Return:
-      - list of all User objects JSON represented
+      - list of all User objects JSON represented (one page of them
+        when paginated, with a Link header to the next page)
+      - 400 if a parameter is invalid
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    sort = request.args.get('sort')
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    if sort is None and limit is None and cursor is None:
+        all_users = User.all()
+        next_cursor = None
+    else:
+        sort = sort or 'created_at'
+        reverse = sort.startswith('-')
+        if sort.lstrip('-') not in User.__ordered_indexes__:
+            return jsonify({'error': "Wrong sort"}), 400
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                limit = 0
+            if limit <= 0:
+                return jsonify({'error': "Wrong limit"}), 400
+        try:
+            all_users, next_cursor = User.page(sort.lstrip('-'), cursor,
+                                               limit, reverse)
+        except ValueError:
+            return jsonify({'error': "Wrong cursor"}), 400
+    body = b",".join(user.to_json_bytes() for user in all_users)
+    response = Response(b"[" + body + b"]", mimetype='application/json')
+    if next_cursor is not None:
+        query = {'sort': sort, 'cursor': next_cursor}
+        if limit is not None:
+            query['limit'] = limit
+        response.headers['Link'] = '<{}?{}>; rel="next"'.format(
+            request.base_url, urlencode(query))
+    return response
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -30,7 +67,7 @@ def view_one_user(user_id: str = None) -> str:
     user = User.get(user_id)
     if user is None:
         abort(404)
-    return jsonify(user.to_json())
+    return Response(user.to_json_bytes(), mimetype='application/json')
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+""" Bench hashing: login throughput (password checks per second) of
+request threads hashing inline or through the hashing service, with 1 to
+N workers
+
+    python3 bench_hashing.py [logins] [iterations]
+
+The password hash is a deliberately slow KDF (PBKDF2-SHA256 with
+`iterations` rounds, releasing the GIL), plus a pure-Python variant
+holding the GIL, which only a process pool runs in parallel.
+"""
+import hashlib
+import os
+import sys
+import threading
+import time
+from models.hashing import HashingBusy, HashingService
+
+
+ITERATIONS = 20000
+
+
+def kdf(pwd: str) -> str:
+    """ Slow hash releasing the GIL
+    """
+    return hashlib.pbkdf2_hmac('sha256', pwd.encode(), b'salt',
+                               ITERATIONS).hex()
+
+
+def kdf_gil(pwd: str) -> str:
+    """ Slow hash holding the GIL
+    """
+    digest = pwd.encode()
+    for _ in range(ITERATIONS // 10):
+        digest = hashlib.sha256(digest).digest()
+    return digest.hex()
+
+
+def logins(check, count: int, threads: int) -> float:
+    """ Logins per second of `threads` request threads running `count`
+    checks in all
+    """
+    remaining = [count]
+    lock = threading.Lock()
+
+    def request_thread():
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            check("password")
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=request_thread) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    if len(sys.argv) > 2:
+        ITERATIONS = int(sys.argv[2])
+    cores = os.cpu_count() or 1
+    workers = sorted({1, 2, cores // 2 or 1, cores})
+    threads = 4 * cores
+    print("{} logins, {} request threads, {} cores".format(
+        count, threads, cores))
+    for function in (kdf, kdf_gil):
+        print("{}:".format(function.__name__))
+        print("  {:<9} {:>2} workers {:>8.0f} logins/s".format(
+            "inline", "-", logins(function, count, threads)))
+        for executor in ('thread', 'process'):
+            for n in workers:
+                service = HashingService(executor, n, 4 * n)
+                # start the pool before timing
+                service.run(function, "warm up")
+                rate = logins(lambda pwd: service.run(function, pwd),
+                              count, threads)
+                service.shutdown()
+                print("  {:<9} {:>2} workers {:>8.0f} logins/s".format(
+                    executor, n, rate))
+
+    # backpressure: a queue of 1 and no wait reject the excess callers
+    service = HashingService('thread', 1, 1, timeout=0)
+    rejected = [0]
+
+    def check(pwd: str):
+        try:
+            service.run(kdf, pwd)
+        except HashingBusy:
+            rejected[0] += 1
+    logins(check, count, threads)
+    service.shutdown()
+    print("backpressure (1 worker, queue of 1, no wait): {}/{} rejected"
+          .format(rejected[0], count))
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+""" Bench journal: per-write latency of User.save() as the store grows,
+with the full-snapshot rewrite and with the append-only journal
+"""
+import os
+import sys
+import tempfile
+import time
+from models import base
+from models.user import User
+
+
+def fill(count: int):
+    """ Put `count` users in memory and write them as the snapshot
+    """
+    base.DATA['User'] = {}
+    for i in range(count):
+        user = User(email="user{}@hbtn.io".format(i), first_name="Bob")
+        base.DATA['User'][user.id] = user
+    User.save_to_file()
+
+
+def write_latency(writes: int) -> float:
+    """ Average seconds per profile edit on existing users
+    """
+    users = list(base.DATA['User'].values())[:writes]
+    start = time.perf_counter()
+    for user in users:
+        user.last_name = "Dylan"
+        user.save()
+    return (time.perf_counter() - start) / len(users)
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 10000, 100000]
+    os.chdir(tempfile.mkdtemp())
+    print("{:>8} {:>14} {:>14}".format(
+        "users", "snapshot (ms)", "journal (ms)"))
+    for size in sizes:
+        results = []
+        for journal in (False, True):
+            User.__journal__ = journal
+            fill(size)
+            writes = 20 if not journal else 2000
+            results.append(write_latency(min(writes, size)) * 1000)
+        print("{:>8} {:>14.3f} {:>14.3f}".format(size, *results))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+""" Bench load: time and peak RSS of User.load_from_file() with the
+whole-file json.load and with the streaming loader
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def write_snapshot(count: int):
+    """ Write a .db_User.json holding `count` users
+    """
+    with open(".db_User.json", 'w') as f:
+        f.write("{")
+        for i in range(count):
+            obj_id = "{:08d}-0000-4000-8000-000000000000".format(i)
+            f.write("{}{}: {}".format("," if i else "", json.dumps(obj_id),
+                                      json.dumps({
+                                          "id": obj_id,
+                                          "created_at": "2024-01-01T00:00:00",
+                                          "updated_at": "2024-01-01T00:00:00",
+                                          "email": "user{}@hbtn.io".format(i),
+                                          "_password": "0" * 64,
+                                          "first_name": "Bob",
+                                          "last_name": "Dylan"})))
+        f.write("}")
+
+
+def measure(mode: str):
+    """ Load the snapshot in this process and print seconds and peak MB
+    """
+    from models import base
+    from models.user import User
+    start = time.perf_counter()
+    if mode == "json.load":
+        base.DATA['User'] = {}
+        with open(User.file_path(), 'r') as f:
+            for obj_id, obj_json in json.load(f).items():
+                base.DATA['User'][obj_id] = User(**obj_json)
+    else:
+        User.__lazy__ = mode.startswith("lazy")
+        User.load_from_file()
+        assert User.count() > 0
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print("{:.2f} {:.0f}".format(elapsed, peak))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--measure":
+        measure(sys.argv[2])
+        sys.exit(0)
+    sizes = [int(a) for a in sys.argv[1:]] or [100000, 1000000]
+    script = os.path.abspath(__file__)
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    os.chdir(tempfile.mkdtemp())
+    print("{:>8} {:>10} {:>9} {:>14}".format(
+        "users", "loader", "time (s)", "peak RSS (MB)"))
+    for size in sizes:
+        write_snapshot(size)
+        for mode in ("json.load", "stream", "lazy", "binary", "lazy-bin"):
+            if mode == "binary":
+                subprocess.check_call([sys.executable, "-c", (
+                    "from models.user import User; User.load_from_file(); "
+                    "User.__serializer__ = 'binary'; User.save_to_file()")],
+                    env=env)
+            # binary modes load the .db_User.bin written above
+            out = subprocess.check_output(
+                [sys.executable, script, "--measure", mode],
+                env=dict(env, MODEL_FORMAT="binary" if "bin" in mode
+                         else "json"))
+            elapsed, peak = out.decode().split()
+            print("{:>8} {:>10} {:>9} {:>14}".format(size, mode, elapsed,
+                                                     peak))
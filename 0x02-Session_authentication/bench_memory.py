@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+""" Bench memory: bytes allocated per User record built from a snapshot
+"""
+import json
+import sys
+import tracemalloc
+from models.user import User
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    records = [{
+        "id": "{:08d}-0000-4000-8000-000000000000".format(i),
+        "created_at": "2024-01-{:02d}T10:00:{:02d}".format(i % 28 + 1, i % 60),
+        "updated_at": "2024-01-{:02d}T10:00:{:02d}".format(i % 28 + 1, i % 60),
+        "email": "user{}@hbtn.io".format(i),
+        "_password": "{:064x}".format(i),
+        "first_name": "Bob",
+        "last_name": "Dylan"} for i in range(count)]
+
+    text = json.dumps(records)
+    del records
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    # decoded like the snapshot loader does: the records are released
+    # once loaded, only what the instances keep is counted
+    users = [User(**r) for r in json.loads(text)]
+    after = tracemalloc.get_traced_memory()[0]
+    print("{} users: {:.0f} bytes/record".format(
+        count, (after - before) / count))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+""" Bench prefork: memory of N forked workers serving the same users,
+each loading the store itself or sharing the one frozen by the master
+"""
+import json
+import os
+import sys
+import tempfile
+from bench_load import write_snapshot
+from models.base import Base
+from models.overlay import memory_usage
+from models.user import User
+
+
+def workload(worker: int, count: int):
+    """ Index lookups, prefix queries, stats and a few writes
+    """
+    for i in range(0, count, max(1, count // 1000)):
+        User.query().eq('email', "user{}@hbtn.io".format(i)).first()
+    for i in range(100):
+        User.query().prefix('email', "user{}".format(i)).limit(10).all()
+    User.stats()
+    for i in range(50):
+        User(email="w{}-{}@hbtn.io".format(worker, i)).save()
+
+
+def worker(worker: int, count: int, load: bool, out: int):
+    """ Forked worker: report its memory before and after the workload
+    """
+    if load:
+        User.load_from_file()
+    before = memory_usage()
+    workload(worker, count)
+    after = memory_usage()
+    os.write(out, (json.dumps([before, after]) + "\n").encode())
+    os._exit(0)
+
+
+def run(mode: str, workers: int, count: int):
+    """ Fork the workers and print the memory of each
+    """
+    read, write = os.pipe()
+    pids = []
+    for i in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            worker(i, count, mode == "separate", write)
+        pids.append(pid)
+    os.close(write)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    with os.fdopen(read) as f:
+        reports = [json.loads(line) for line in f]
+    print("{} (master: {})".format(mode, memory_usage()))
+    print("{:>8} {:>10} {:>10} {:>10} {:>10}".format(
+        "worker", "rss", "pss", "private", "private+"))
+    total = 0
+    for i, (before, after) in enumerate(reports):
+        print("{:>8} {:>10} {:>10} {:>10} {:>10}".format(
+            i, after['rss'], after['pss'], after['private'],
+            after['private'] - before['private']))
+        total += after['pss']
+    print("{:>8} {:>21}".format("total", total))
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "prefork"
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 100000
+    User.__journal__ = True
+    os.chdir(tempfile.mkdtemp())
+    write_snapshot(count)
+    if mode == "prefork":
+        # compact records from the start: no instances freed in the heap
+        User.__lazy__ = os.getenv("MODEL_LAZY", "1") == "1"
+        User.load_from_file()
+        Base.freeze()
+    run(mode, workers, count)
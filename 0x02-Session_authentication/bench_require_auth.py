@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+""" Bench require_auth: cost of checking a request path against 1,000
+excluded paths, scanned on every call or compiled once by PathMatcher
+(at setup by Auth.exclude(), or looked up by compile_paths())
+"""
+import sys
+import time
+from api.v1.auth.path_matcher import PathMatcher, compile_paths
+
+
+def linear(path: str, excluded_paths: list) -> bool:
+    """ Exclusion check of every rule on every call (previous
+    require_auth, with exact and prefix rules)
+    """
+    path = path.rstrip('/') + '/'
+    for excluded_path in excluded_paths:
+        if excluded_path.endswith('*'):
+            if path.startswith(excluded_path[:-1]):
+                return True
+        elif path == excluded_path.rstrip('/') + '/':
+            return True
+    return False
+
+
+def rules(count: int) -> list:
+    """ `count` excluded paths: exact, prefix and glob rules
+    """
+    result = []
+    for i in range(count):
+        if i % 10 == 0:
+            result.append("/api/v1/public{}/*".format(i))
+        elif i % 10 == 1:
+            result.append("/api/v1/items{}/*/info".format(i))
+        else:
+            result.append("/api/v1/resource{}/".format(i))
+    return result
+
+
+def timed(label: str, check, paths: list, repeat: int):
+    """ Print the time per check of `paths`, `repeat` times
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path in paths:
+            check(path)
+    elapsed = time.perf_counter() - start
+    print("{:<30} {:>9.2f} µs/check".format(
+        label, elapsed / (repeat * len(paths)) * 1e6))
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    excluded = rules(count)
+    paths = {
+        'exact hit': ["/api/v1/resource{}".format(i)
+                      for i in range(2, count, 10)],
+        'prefix hit': ["/api/v1/public{}/x/y".format(i)
+                       for i in range(0, count, 10)],
+        'miss': ["/api/v1/users/{}".format(i) for i in range(100)],
+    }
+    print("{} excluded paths".format(count))
+    start = time.perf_counter()
+    matcher = PathMatcher(excluded)
+    print("{:<30} {:>9.2f} ms".format(
+        "compile", (time.perf_counter() - start) * 1e3))
+    for name, sample in paths.items():
+        expected = [linear(p, excluded) for p in sample]
+        assert [matcher.match(p) for p in sample] == expected, name
+        timed("linear, " + name, lambda p: linear(p, excluded), sample, 5)
+        # no per-path cache: every check walks the set, trie and pattern
+        uncached = PathMatcher(excluded, cache_size=0)
+        timed("compiled, " + name, uncached.match, sample, 50)
+        # require_auth on a list compiled by Auth.exclude(), or looked up
+        # by its patterns
+        timed("require_auth, " + name, lambda p: not matcher.match(p),
+              sample, 50)
+        timed("compile_paths, " + name,
+              lambda p: not compile_paths(excluded).match(p),
+              sample, 50)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+""" Bench session backend: lookup cost of the memory backend and of the
+Redis backend talking to the session daemon (one by one and pipelined),
+and whether sessions created by one worker are seen by the others
+
+    python3 bench_session_backend.py [workers]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from api.v1.auth.session_backend import session_backend
+from models.base import new_id
+
+
+def per_call(function, count: int) -> float:
+    """ Microseconds per call of function()
+    """
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def start_daemon(socket_path: str) -> subprocess.Popen:
+    """ Session daemon listening on `socket_path`
+    """
+    daemon = subprocess.Popen([sys.executable, '-m',
+                               'api.v1.auth.session_daemon',
+                               '--socket', socket_path])
+    while not os.path.exists(socket_path):
+        time.sleep(0.01)
+    return daemon
+
+
+def workers_share(backend_name: str, url: str, workers: int) -> int:
+    """ Sessions created by each forked worker and found by the next one
+    """
+    ids = []
+    for _ in range(workers):
+        read, write = os.pipe()
+        if os.fork() == 0:
+            backend = session_backend(backend_name, url)
+            session_id = new_id()
+            backend.set(session_id, "user", 60)
+            os.write(write, session_id.encode())
+            os._exit(0)
+        os.wait()
+        ids.append(os.read(read, 36).decode())
+    found = 0
+    for i in range(workers):
+        if os.fork() == 0:
+            backend = session_backend(backend_name, url)
+            os._exit(0 if backend.get(ids[(i + 1) % workers]) else 1)
+        found += os.wait()[1] == 0
+    return found
+
+
+if __name__ == "__main__":
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    socket_path = os.path.join(tempfile.mkdtemp(), 'sessions.sock')
+    url = 'unix://' + socket_path
+    daemon = start_daemon(socket_path)
+    try:
+        for name in ('memory', 'redis'):
+            backend = session_backend(name, url)
+            ids = [new_id() for _ in range(100)]
+            for session_id in ids:
+                backend.set(session_id, "user", 60)
+            one = per_call(lambda: backend.get(ids[0]), 2000)
+            sequential = per_call(lambda: [backend.get(i) for i in ids], 20)
+            pipelined = per_call(lambda: backend.get_many(ids), 20)
+            shared = workers_share(name, url, workers)
+            print("{:<7} get {:>6.1f} µs  100 gets {:>7.0f} µs  get_many(100)"
+                  " {:>7.0f} µs  shared by workers: {}/{}".format(
+                      name, one, sequential, pipelined, shared, workers))
+            if name == 'memory':
+                backend.stop()
+    finally:
+        daemon.terminate()
+        daemon.wait()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+""" Bench session tokens: per-request authentication cost of
+SessionExpAuth (session store lookup, then User.get) and of
+SessionTokenAuth (signature check, then User.get and the generation
+check), with the memory each keeps per session
+
+    python3 bench_session_tokens.py [sessions] [users]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from api.v1.auth.session_store import SessionStore
+from api.v1.auth.session_token import TokenSigner
+from models.base import new_id
+from models.user import User
+
+
+DURATION = 3600
+
+
+def per_call(function, values: list) -> float:
+    """ Microseconds per call of function(value)
+    """
+    start = time.perf_counter()
+    for value in values:
+        function(value)
+    return (time.perf_counter() - start) / len(values) * 1e6
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    user_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    os.chdir(tempfile.mkdtemp())
+    users = [User(email="u{}@hbtn.io".format(i)) for i in range(user_count)]
+    User.save_many(users)
+    user_ids = [users[i % user_count].id for i in range(count)]
+    print("{} sessions of {} users".format(count, user_count))
+
+    # SessionExpAuth: create_session, then user_id_for_session_id and
+    # User.get on each request
+    tracemalloc.start()
+    store = SessionStore(max_sessions=0, sweep_interval=60)
+    session_ids = []
+    for user_id in user_ids:
+        session_id = new_id()
+        store.set(session_id, sys.intern(user_id), DURATION)
+        session_ids.append(session_id)
+    memory = tracemalloc.get_traced_memory()[0] - \
+        sum(sys.getsizeof(s) for s in session_ids) - \
+        sys.getsizeof(session_ids)
+    tracemalloc.stop()
+
+    def session_request(session_id: str):
+        return User.get(store.get(session_id))
+    assert session_request(session_ids[0]) is users[0]
+    print("{:<16} {:>6.2f} µs/request {:>6.0f} bytes/session".format(
+        "SessionExpAuth", per_call(session_request, session_ids),
+        memory / count))
+    store.stop()
+
+    # SessionTokenAuth: sign at login, verify on each request
+    signer = TokenSigner({1: os.urandom(32)})
+    tokens = [signer.sign(user_id, DURATION, 0) for user_id in user_ids]
+
+    def token_request(token: str):
+        user_id, generation = signer.verify(token)
+        user = User.get(user_id)
+        if user.session_generation != generation:
+            return None
+        return user
+    assert token_request(tokens[0]) is users[0]
+    print("{:<16} {:>6.2f} µs/request {:>6.0f} bytes/session".format(
+        "SessionTokenAuth", per_call(token_request, tokens), 0))
+    print("{:<16} {:>6.2f} µs/token, {} characters".format(
+        "  sign", per_call(lambda u: signer.sign(u, DURATION, 0),
+                           user_ids[:10000]), len(tokens[0])))
+
+    # rotation: tokens of the previous key stay valid until retired
+    signer.rotate(2, os.urandom(32))
+    assert token_request(tokens[0]) is users[0]
+    signer.retire(1)
+    assert signer.verify(tokens[0]) is None
+    # revocation: a logout moves the user to the next generation
+    token = signer.sign(users[1].id, DURATION, users[1].session_generation)
+    users[1].revoke_sessions()
+    assert token_request(token) is None
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+""" Bench sessions: memory per session and lookup latency of the session
+entries of SessionExpAuth, as dicts of a datetime checked against
+datetime.now() or as compact SessionStore entries
+
+    python3 bench_sessions.py [sessions] [users]
+"""
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from uuid import uuid4
+from api.v1.auth.session_store import SessionStore
+from models.base import new_id
+
+
+DURATION = 3600
+
+
+class DictSessions():
+    """ Previous layout: str(uuid4()) -> {'user_id', 'created_at'}
+    """
+
+    def __init__(self):
+        self.sessions = {}
+
+    def create(self, user_id: str) -> str:
+        session_id = str(uuid4())
+        self.sessions[session_id] = {'user_id': user_id,
+                                     'created_at': datetime.now()}
+        return session_id
+
+    def lookup(self, session_id: str) -> str:
+        data = self.sessions.get(session_id)
+        if not data:
+            return None
+        created_at = data.get('created_at')
+        if created_at + timedelta(seconds=DURATION) < datetime.now():
+            return None
+        return data['user_id']
+
+
+class StoreSessions():
+    """ Current layout: a SessionStore, as used by SessionExpAuth
+    """
+
+    def __init__(self):
+        self.sessions = SessionStore(max_sessions=0, sweep_interval=60)
+
+    def create(self, user_id: str) -> str:
+        session_id = new_id()
+        self.sessions.set(session_id, sys.intern(user_id), DURATION)
+        return session_id
+
+    def lookup(self, session_id: str) -> str:
+        return self.sessions.get(session_id)
+
+
+def bench(layout, count: int, users: list):
+    """ Print the memory per session and the lookup latency of a layout
+    """
+    tracemalloc.start()
+    sessions = layout()
+    # request-like user IDs: a new string per request
+    for i in range(count):
+        sessions.create("".join(users[i % len(users)]))
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # session IDs as sent back by the clients (cookies)
+    ids = list(sessions.sessions)
+    start = time.perf_counter()
+    for session_id in ids:
+        sessions.lookup(session_id)
+    lookup = (time.perf_counter() - start) / count
+    assert sessions.lookup(ids[-1]) == users[(count - 1) % len(users)]
+    assert sessions.lookup(ids[-1].upper()) is None
+    print("{:<16} {:>7.0f} bytes/session {:>7.2f} µs/lookup".format(
+        layout.__name__, memory / count, lookup * 1e6))
+    if isinstance(sessions, StoreSessions):
+        sessions.sessions.stop()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    users = [new_id() for _ in range(int(sys.argv[2])
+                                     if len(sys.argv) > 2 else 1000)]
+    print("{} sessions of {} users".format(count, len(users)))
+    for layout in (DictSessions, StoreSessions):
+        bench(layout, count, users)
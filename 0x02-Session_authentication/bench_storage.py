@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+""" Bench storage: load, search and write costs of the dict+JSON engine
+and of the SQLite engine (MODEL_STORAGE=sqlite)
+"""
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def measure():
+    """ Time the operations with the engine selected by the environment
+    """
+    from models.user import User
+    start = time.perf_counter()
+    User.load_from_file()
+    load = time.perf_counter() - start
+
+    count = User.count()
+    emails = ["user{}@hbtn.io".format(random.randrange(count))
+              for _ in range(1000)]
+    # the first search on an attribute may build its index
+    User.search({'email': emails[0]})
+    start = time.perf_counter()
+    for email in emails:
+        assert len(User.search({'email': email})) == 1
+    search = (time.perf_counter() - start) / len(emails)
+
+    users = [User.search({'email': e})[0] for e in emails[:50]]
+    start = time.perf_counter()
+    for user in users:
+        user.last_name = "Dylan"
+        user.save()
+    write = (time.perf_counter() - start) / len(users)
+    print("{:.3f} {:.1f} {:.3f}".format(load, search * 1e6, write * 1e3))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2 and sys.argv[1] == "--measure":
+        measure()
+        sys.exit(0)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    script = os.path.abspath(__file__)
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    os.chdir(tempfile.mkdtemp())
+    subprocess.check_call([sys.executable, "-c", (
+        "from models.user import User; User.load_from_file(); "
+        "User.save_many(User(email='user{{}}@hbtn.io'.format(i)) "
+        "for i in range({}))").format(count)], env=env)
+
+    print("{} users".format(count))
+    print("{:>8} {:>10} {:>12} {:>10}".format(
+        "engine", "load (s)", "search (us)", "write (ms)"))
+    for engine in ("memory", "sqlite"):
+        env['MODEL_STORAGE'] = engine
+        if engine == "sqlite":
+            # first run imports the JSON snapshot into the database
+            subprocess.check_call([sys.executable, "-c", (
+                "from models.user import User; User.load_from_file()")],
+                env=env)
+        out = subprocess.check_output(
+            [sys.executable, script, "--measure"], env=env)
+        print("{:>8} {:>10} {:>12} {:>10}".format(
+            engine, *out.decode().split()))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+""" Bench threads: concurrent writers and readers on the model store.
+Checks that no write is lost (in memory and on disk) and reports the
+write throughput as the number of writer threads grows
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from models.user import User
+
+
+def writer(prefix: str, count: int, errors: list):
+    """ Create `count` users, then update each of them
+    """
+    try:
+        users = []
+        for i in range(count):
+            user = User(email="{}-{}@hbtn.io".format(prefix, i))
+            user.save()
+            users.append(user)
+        for user in users:
+            user.first_name = prefix
+            user.save()
+    except Exception as e:
+        errors.append(e)
+
+
+def reader(stop: threading.Event, errors: list):
+    """ Search and list users until told to stop
+    """
+    try:
+        while not stop.is_set():
+            User.search({'email': "w0-0@hbtn.io"})
+            User.search({'first_name': "w1"})
+            len(User.all())
+    except Exception as e:
+        errors.append(e)
+
+
+def run(threads: int, count: int) -> float:
+    """ Run the writers against 2 readers, in a directory of their own,
+    check the result and return the writes per second
+    """
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            return run_here(threads, count)
+        finally:
+            os.chdir(cwd)
+
+
+def run_here(threads: int, count: int) -> float:
+    """ run() in the current directory, expected empty
+    """
+    User.load_from_file()
+    errors = []
+    stop = threading.Event()
+    readers = [threading.Thread(target=reader, args=(stop, errors))
+               for _ in range(2)]
+    writers = [threading.Thread(target=writer,
+                                args=("w{}".format(t), count, errors))
+               for t in range(threads)]
+    for thread in readers:
+        thread.start()
+    start = time.perf_counter()
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    assert not errors, errors
+    expected = threads * count
+    assert User.count() == expected, (User.count(), expected)
+    for t in range(threads):
+        assert len(User.search({'first_name': "w{}".format(t)})) == count
+    User.load_from_file()
+    assert User.count() == expected, "lost on disk"
+    assert len(User.search({'first_name': None})) == 0, "stale on disk"
+    return 2 * expected / elapsed
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    User.__journal__ = True
+    print("{:>8} {:>12}".format("writers", "writes/s"))
+    for threads in (1, 2, 4, 8):
+        print("{:>8} {:>12.0f}".format(threads, run(threads, count)))
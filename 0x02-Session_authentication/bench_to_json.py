@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+""" Bench to_json: building the GET /api/v1/users body for all users
+without and with the cached serialized forms
+"""
+import json
+import sys
+import time
+from models import base
+from models.user import User
+
+
+def uncached_json(user: User) -> dict:
+    """ to_json() computed from scratch
+    """
+    object.__setattr__(user, '_json_cache', None)
+    return user.to_json()
+
+
+def list_body_uncached() -> bytes:
+    """ Body built like before the cache: to_json() + one dumps
+    """
+    return json.dumps([uncached_json(u) for u in User.all()],
+                      sort_keys=True).encode('utf-8')
+
+
+def list_body() -> bytes:
+    """ Body built by view_all_users from the cached bytes
+    """
+    return b"[" + b",".join(u.to_json_bytes() for u in User.all()) + b"]"
+
+
+def timed(function) -> float:
+    """ Seconds taken by one call
+    """
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    base.DATA['User'] = {}
+    for i in range(count):
+        user = User(email="user{}@hbtn.io".format(i), first_name="Bob")
+        base.DATA['User'][user.id] = user
+
+    print("{} users".format(count))
+    print("no cache:     {:.3f} s".format(timed(list_body_uncached)))
+    for user in User.all():
+        object.__setattr__(user, '_json_cache', None)
+    print("cold cache:   {:.3f} s".format(timed(list_body)))
+    print("warm cache:   {:.3f} s".format(timed(list_body)))
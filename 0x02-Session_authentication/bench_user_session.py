@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+""" Bench user sessions: cost of a SessionDBAuth login (UserSession
+save) and of a request (lookup by session ID) as the number of stored
+sessions grows, for the indexed and journaled UserSession and for a scan
+with a snapshot rewrite per save
+
+    python3 bench_user_session.py [sessions ...]
+"""
+import os
+import sys
+import tempfile
+import time
+from models.base import new_id
+from models.user_session import UserSession
+
+
+def per_call(function, count: int) -> float:
+    """ Microseconds per call of function(i) for i in range(count)
+    """
+    start = time.perf_counter()
+    for i in range(count):
+        function(i)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def scan(session_id: str) -> UserSession:
+    """ Previous lookup: every session compared
+    """
+    for session in UserSession.all():
+        if session.session_id == session_id:
+            return session
+    return None
+
+
+def bench(count: int):
+    """ Print the login and lookup costs with `count` stored sessions,
+    in a directory of their own
+    """
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            bench_here(count)
+        finally:
+            os.chdir(cwd)
+
+
+def bench_here(count: int):
+    """ bench() in the current directory, expected empty
+    """
+    users = [new_id() for _ in range(100)]
+    UserSession.save_many(UserSession(user_id=users[i % 100],
+                                      session_id=new_id())
+                          for i in range(count))
+    UserSession.load_from_file()
+    ids = [s.session_id for s in UserSession.all()][:1000]
+
+    def login(i: int):
+        UserSession(user_id=users[i % 100], session_id=new_id()).save()
+    journaled = per_call(login, 200)
+    UserSession.__journal__ = False
+    rewrite = per_call(login, 3)
+    UserSession.__journal__ = True
+    indexed = per_call(
+        lambda i: UserSession.by_session_id(ids[i % len(ids)]), 1000)
+    scanned = per_call(lambda i: scan(ids[i]), 3)
+    print("{:>7} {:>12.0f} {:>12.0f} {:>12.1f} {:>12.0f}".format(
+        count, journaled, rewrite, indexed, scanned))
+
+
+if __name__ == "__main__":
+    counts = [int(c) for c in sys.argv[1:]] or [1000, 10000, 100000]
+    print("{:>7} {:>12} {:>12} {:>12} {:>12}".format(
+        "stored", "login µs", "rewrite µs", "lookup µs", "scan µs"))
+    for count in counts:
+        bench(count)
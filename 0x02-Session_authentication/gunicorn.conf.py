@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+""" gunicorn settings: the master loads the model store once and forked
+workers share it. Run from this directory, with MODEL_LAZY=1 so that the
+master keeps compact records: MODEL_LAZY=1 gunicorn api.v1.app:app
+
+With SESSION_DAEMON=1, the master also runs the session daemon that the
+workers share sessions through (with SESSION_BACKEND=redis and a unix://
+SESSION_BACKEND_URL)
+"""
+from os import getenv
+import subprocess
+import sys
+
+
+bind = "{}:{}".format(getenv("API_HOST", "0.0.0.0"),
+                      getenv("API_PORT", "5000"))
+workers = int(getenv("API_WORKERS", "4"))
+# import the app, and so load the models, in the master
+preload_app = True
+
+
+SESSION_DAEMON = None
+
+
+def on_starting(server):
+    """ Start the session daemon before the workers
+    """
+    global SESSION_DAEMON
+    if getenv("SESSION_DAEMON", "0") != "1":
+        return
+    from api.v1.auth.session_backend import DEFAULT_URL
+    url = getenv("SESSION_BACKEND_URL", DEFAULT_URL)
+    if not url.startswith("unix://"):
+        server.log.warning("SESSION_DAEMON needs a unix:// "
+                           "SESSION_BACKEND_URL, not %s", url)
+        return
+    SESSION_DAEMON = subprocess.Popen(
+        [sys.executable, "-m", "api.v1.auth.session_daemon",
+         "--socket", url[len("unix://"):]])
+    server.log.info("Session daemon started (pid %s)", SESSION_DAEMON.pid)
+
+
+def on_exit(server):
+    """ Stop the session daemon
+    """
+    if SESSION_DAEMON is not None:
+        SESSION_DAEMON.terminate()
+        SESSION_DAEMON.wait()
+
+
+def when_ready(server):
+    """ Master ready to fork: freeze the loaded objects
+    """
+    from models.base import Base
+    from models.overlay import memory_usage
+    Base.freeze()
+    server.log.info("Model store frozen, master memory: %s kB",
+                    memory_usage())
+
+
+def post_fork(server, worker):
+    """ Memory of a worker when it starts
+    """
+    from models.overlay import memory_usage
+    server.log.info("Worker %s started, memory: %s kB", worker.pid,
+                    memory_usage())
+
+
+def worker_exit(server, worker):
+    """ Memory of a worker when it stops
+    """
+    from models.overlay import memory_usage
+    server.log.info("Worker %s exiting, memory: %s kB", worker.pid,
+                    memory_usage())
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+""" Main bulk: users exported and imported again keep their fields,
+session generation included
+"""
+import io
+import os
+import tempfile
+from models import base
+from models.bulk import export_users, import_users
+from models.user import User
+
+os.chdir(tempfile.mkdtemp())
+user = User(email="bob@hbtn.io", first_name="Bob")
+user.password = "H0lbertonSchool98!"
+user.save()
+user.revoke_sessions()
+user.revoke_sessions()
+print("Session generation: {}".format(user.session_generation))
+
+for fmt in ('csv', 'jsonl'):
+    f = io.StringIO()
+    export_users(f, fmt)
+    base.DATA[User.__name__] = {}
+    User.reindex()
+    f.seek(0)
+    import_users(f, fmt, workers=1)
+    imported = User.get(user.id)
+    print("{}: {} / generation {} / password {}".format(
+        fmt, imported.email, imported.session_generation,
+        imported.is_valid_password("H0lbertonSchool98!")))
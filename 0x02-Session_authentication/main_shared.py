@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+""" Main shared: processes sharing the model files (MODEL_SHARED=1)
+
+- 3 writer processes save, update and remove users while this process
+  polls Base.sync(), the journal being compacted every 20 kB: it ends
+  with the users of a fresh load, without loading the files again
+- a writer holds the exclusive flock: readers and other writers wait
+- replay: a torn last line is skipped, a process one compaction behind
+  reads the end of .journal.prev, one two compactions behind reloads
+"""
+import fcntl
+import os
+import tempfile
+import time
+
+os.environ["MODEL_SHARED"] = "1"
+os.environ["MODEL_JOURNAL_COMPACT_SIZE"] = "20000"
+os.chdir(tempfile.mkdtemp())
+
+from models import base  # noqa: E402
+from models.user import User  # noqa: E402
+
+
+def in_child(function, *args) -> int:
+    """ Run function(*args) in a forked process, return its pid
+    """
+    pid = os.fork()
+    if pid == 0:
+        try:
+            User.load_from_file()
+            function(*args)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def writer(name: str, count: int):
+    """ Create `count` users, update half of them, remove a quarter
+    """
+    users = []
+    for i in range(count):
+        user = User(email="{}-{}@hbtn.io".format(name, i))
+        user.save()
+        users.append(user)
+    for user in users[::2]:
+        user.first_name = name
+        user.save()
+    for user in users[::4]:
+        user.remove()
+
+
+def fresh_ids() -> set:
+    """ IDs of a fresh load of the files, by another process
+    """
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        User.load_from_file()
+        os.write(write, "\n".join(sorted(base.DATA['User'])).encode())
+        os._exit(0)
+    os.close(write)
+    data = b""
+    while True:
+        chunk = os.read(read, 65536)
+        if not chunk:
+            break
+        data += chunk
+    os.waitpid(pid, 0)
+    return set(filter(None, data.decode().split("\n")))
+
+
+""" Journal sync: 3 writers, 1 polling reader """
+User.load_from_file()
+writers = [in_child(writer, "w{}".format(i), 300) for i in range(3)]
+reloads = 0
+syncs = 0
+while writers:
+    reloads += User.sync() < 0
+    syncs += 1
+    for pid in list(writers):
+        if os.waitpid(pid, os.WNOHANG)[0] == pid:
+            writers.remove(pid)
+reloads += User.sync() < 0
+ids = set(base.DATA['User'])
+print("Users: {}".format(len(ids)))
+print("Same users as a fresh load: {}".format(ids == fresh_ids()))
+print("Updates seen: {}".format(
+    len(User.search({'first_name': "w0"})) == 75))
+print("Reloads: {} ({} syncs, {} compactions)".format(
+    reloads, syncs, base.POSITIONS['User'][0]))
+
+""" flock: a writer excludes readers and other writers """
+read, write = os.pipe()
+
+
+def hold_lock():
+    """ Hold the writer lock of User for half a second
+    """
+    with base.class_lock('User'), User._file_lock(True):
+        os.write(write, b"1")
+        time.sleep(0.5)
+
+
+pid = in_child(hold_lock)
+os.read(read, 1)
+with open(User.lock_path(), 'a') as f:
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH | fcntl.LOCK_NB)
+        print("Lock held by the writer: False")
+    except BlockingIOError:
+        print("Lock held by the writer: True")
+start = time.monotonic()
+User(email="late@hbtn.io").save()
+print("Save waited for the writer: {}".format(
+    time.monotonic() - start > 0.3))
+os.waitpid(pid, 0)
+
+""" Replay: torn line """
+with open(User.journal_path(), 'a') as f:
+    f.write('{"op": "save", "id": "torn", "obj": {"id": "to')
+print("Torn line skipped: {}".format("torn" not in fresh_ids()))
+with open(User.journal_path(), 'r+') as f:
+    content = f.read()
+    f.seek(0)
+    f.write(content[:content.rindex("\n") + 1])
+    f.truncate()
+
+""" Replay: one compaction behind, then two """
+
+
+def save_and_compact(count: int, compactions: int):
+    """ Write users and compact the journal, `compactions` times
+    """
+    for i in range(compactions):
+        writer("c{}-{}".format(count, i), count)
+        User.compact()
+
+
+User.sync()
+os.waitpid(in_child(save_and_compact, 20, 1), 0)
+applied = User.sync()
+print("One compaction behind: applied {} records, same users: {}".format(
+    applied, set(base.DATA['User']) == fresh_ids()))
+os.waitpid(in_child(save_and_compact, 20, 2), 0)
+applied = User.sync()
+print("Two compactions behind: reloaded {}, same users: {}".format(
+    applied < 0, set(base.DATA['User']) == fresh_ids()))
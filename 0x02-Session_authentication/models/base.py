@@ -1,39 +1,287 @@
 #!/usr/bin/env python3
 """ Base module
 """
+from contextlib import contextmanager
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
+from typing import Any, Callable, TypeVar, List, Iterable, Tuple
+from os import getenv, path
+from models.flusher import Flusher
+from models.index import HashIndex, OrderedIndex
+from models.overlay import Overlay
+from models.serializers import SERIALIZERS, detect
+from models.sqlite_storage import SQLiteStorage
+import atexit
+import copy
+import fcntl
+import gc
+import hashlib
 import json
-import uuid
+import mmap
+import os
+import threading
+import time
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+INDEXES = {}
+
+# Journaled classes append one line per save/remove to .db_<Class>.journal
+# and only rewrite the full snapshot when the journal grows past
+# max(JOURNAL_COMPACT_SIZE, snapshot size), keeping writes amortized O(1).
+JOURNAL_ENABLED = getenv("MODEL_JOURNAL", "0") == "1"
+JOURNAL_COMPACT_SIZE = int(getenv("MODEL_JOURNAL_COMPACT_SIZE", "4194304"))
+# Snapshot format written by save_to_file ("json" or "binary"); the
+# loader detects the format of the file it reads
+SNAPSHOT_FORMAT = getenv("MODEL_FORMAT", "json")
+# With MODEL_FLUSH_INTERVAL > 0, save()/remove() return right away and a
+# background thread writes the changes of each interval in one go
+FLUSH_INTERVAL = float(getenv("MODEL_FLUSH_INTERVAL", "0"))
+FLUSHER = None
+# sha256 of the last snapshot written, by class name
+DIGESTS = {}
+
+# With MODEL_LAZY=1, load_from_file() keeps the stored records as they
+# are read (RawRecord) and builds an instance on first get/search hit
+LAZY_ENABLED = getenv("MODEL_LAZY", "0") == "1"
+
+# MODEL_STORAGE=sqlite keeps objects in an SQLite file instead of DATA
+STORAGE = None
+if getenv("MODEL_STORAGE", "memory") == "sqlite":
+    STORAGE = SQLiteStorage(getenv("MODEL_SQLITE_PATH", ".db.sqlite3"))
+
+# With MODEL_SHARED=1 several processes (e.g. gunicorn workers) share the
+# files: every class is journaled, writers hold an flock on
+# .db_<Class>.lock and sync() applies the journal lines appended by the
+# other processes since the last check, never the whole snapshot.
+# Compaction starts a new journal generation and keeps the previous one
+# as .journal.prev for the processes that have not read its end yet
+SHARED = getenv("MODEL_SHARED", "0") == "1"
+# sync_all() looks at the files at most once per MODEL_SYNC_INTERVAL
+# seconds (0: on every call)
+SYNC_INTERVAL = float(getenv("MODEL_SYNC_INTERVAL", "0"))
+LAST_SYNC = 0.0
+# (journal generation, inode, offset read so far), by class name
+POSITIONS = {}
+# loaded classes, by name
+CLASSES = {}
+# flock held by this process, by class name
+FILE_LOCKS = {}
+
+# Records written in the same second share one datetime instance
+TIMESTAMPS = {}
+TIMESTAMPS_MAX = 65536
+SLOTS = {}
+# value of the slots not set
+UNSET = object()
+
+# Open Base.batch() of the current thread (None outside of a batch)
+BATCH = threading.local()
+# Number of batches open in any thread: attribute writes only look for
+# the batch of their thread while some batch is open
+OPEN_BATCHES = 0
+OPEN_BATCHES_LOCK = threading.Lock()
+
+# Writers of a class (save, remove, load, file writes) hold its lock;
+# readers never lock: they work on list() copies of DATA / index entries,
+# which CPython builds atomically, and load_from_file publishes a fully
+# built dict
+LOCKS = {}
+
+
+def class_lock(s_class: str) -> threading.RLock:
+    """ Writer lock of a class
+    """
+    lock = LOCKS.get(s_class)
+    if lock is None:
+        lock = LOCKS.setdefault(s_class, threading.RLock())
+    return lock
+
+
+def parse_timestamp(value: str) -> datetime:
+    """ Parse a TIMESTAMP_FORMAT string, reusing already parsed values
+    """
+    timestamp = TIMESTAMPS.get(value)
+    if timestamp is None:
+        if len(TIMESTAMPS) >= TIMESTAMPS_MAX:
+            TIMESTAMPS.clear()
+        timestamp = datetime.strptime(value, TIMESTAMP_FORMAT)
+        TIMESTAMPS[value] = timestamp
+    return timestamp
+
+
+def format_timestamp(value: datetime) -> str:
+    """ TIMESTAMP_FORMAT string of a datetime
+    """
+    if value.tzinfo is None and value.year >= 1000:
+        # same text as strftime(TIMESTAMP_FORMAT), twice as fast
+        return value.isoformat(timespec='seconds')
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+def new_id() -> str:
+    """ Random (version 4) UUID string, as str(uuid.uuid4()) at half
+    the cost
+    """
+    h = os.urandom(16).hex()
+    variant = "89ab"[int(h[16], 16) & 3]
+    return f"{h[:8]}-{h[8:12]}-4{h[13:16]}-{variant}{h[17:20]}-{h[20:]}"
+
+
+class HashingWriter():
+    """ In-memory sink hashing everything written to it: the chunks are
+    kept to be written out once the digest is known
+    """
+
+    def __init__(self):
+        """ Initialize an empty sink
+        """
+        self.chunks = []
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        """ Hash and keep data
+        """
+        self.sha256.update(data)
+        self.chunks.append(data)
+        return len(data)
+
+
+class RawRecord(tuple):
+    """ Stored fields of an object not built yet (lazy loading): a tuple
+    (layout, value, ...) where layout maps field names to positions and
+    is shared by every record with the same fields. It exposes what the
+    indexes, search() and the serializers read
+    """
+    __slots__ = ()
+    LAYOUTS = {}
+    TIMESTAMPS = ('created_at', 'updated_at')
+
+    def __new__(cls, fields: dict):
+        """ Record holding the values of `fields`
+        """
+        names = tuple(fields)
+        layout = cls.LAYOUTS.get(names)
+        if layout is None:
+            layout = cls.LAYOUTS.setdefault(
+                names, {name: i + 1 for i, name in enumerate(names)})
+        return tuple.__new__(cls, (layout,) + tuple(fields.values()))
+
+    @property
+    def id(self) -> str:
+        """ ID of the record
+        """
+        position = self[0].get('id')
+        return None if position is None else self[position]
+
+    def has(self, name: str) -> bool:
+        """ True if `name` is a stored field
+        """
+        return name in self[0]
+
+    def get(self, name: str, default=None):
+        """ Stored value of a field, or `default`
+        """
+        position = self[0].get(name)
+        return default if position is None else self[position]
+
+    def __getattr__(self, name: str):
+        """ Stored value of a field
+        """
+        position = self[0].get(name)
+        if position is None:
+            raise AttributeError(name)
+        return self[position]
+
+    def fields(self) -> dict:
+        """ Stored fields as constructor kwargs
+        """
+        return dict(zip(self[0], self[1:]))
+
+    def attributes(self) -> Iterable[tuple]:
+        """ (name, value) of every field, timestamps as datetime
+        """
+        for key, value in zip(self[0], self[1:]):
+            if key in self.TIMESTAMPS and type(value) is str:
+                value = parse_timestamp(value)
+            yield key, value
+
+    def to_json(self, for_serialization: bool = False) -> dict:
+        """ Fields as Base.to_json() would return them
+        """
+        result = {}
+        for key, value in zip(self[0], self[1:]):
+            if not for_serialization and key[0] == '_':
+                continue
+            if type(value) is datetime:
+                value = format_timestamp(value)
+            result[key] = value
+        return result
+
+
+def comparable(value):
+    """ Timestamps as ISO 8601 strings, other values unchanged
+    """
+    if type(value) is datetime:
+        return value.isoformat()
+    return value
+
+
+def fsync_directory(directory: str):
+    """ Make a rename in `directory` durable
+    """
+    try:
+        fd = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
 
 class Base():
     """ Base class
     """
+    # subclasses declaring __slots__ too are stored without a __dict__
+    __slots__ = ('id', 'created_at', 'updated_at', '_json_cache')
+    __journal__ = JOURNAL_ENABLED or SHARED
+    __serializer__ = SNAPSHOT_FORMAT
+    __lazy__ = LAZY_ENABLED
+    # attribute names (or HashIndex templates) indexed for search()
+    __indexes__ = ()
+    # attribute names kept sorted for ordered scans and page()
+    __ordered_indexes__ = ()
+    # counters kept up to date on save/remove for stats()
+    # (models.stats.Histogram templates)
+    __stats__ = ()
+    # slot names left unset, and not stored, while they are None
+    __optional__ = ()
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
         s_class = str(self.__class__.__name__)
         if DATA.get(s_class) is None:
-            DATA[s_class] = {}
+            DATA.setdefault(s_class, {})
 
-        self.id = kwargs.get('id', str(uuid.uuid4()))
-        if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
-        else:
+        self.id = kwargs['id'] if 'id' in kwargs else new_id()
+        created_at = kwargs.get('created_at')
+        if created_at is None:
             self.created_at = datetime.utcnow()
-        if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+        elif type(created_at) is datetime:
+            self.created_at = created_at
         else:
+            self.created_at = parse_timestamp(created_at)
+        updated_at = kwargs.get('updated_at')
+        if updated_at is None:
             self.updated_at = datetime.utcnow()
+        elif type(updated_at) is datetime:
+            self.updated_at = updated_at
+        else:
+            self.updated_at = parse_timestamp(updated_at)
 
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
@@ -44,69 +292,848 @@ class Base():
             return False
         return (self.id == other.id)
 
+    @classmethod
+    def slots(cls) -> tuple:
+        """ Slot attribute names of this class, base classes first
+        """
+        slots = SLOTS.get(cls)
+        if slots is None:
+            slots = ()
+            for klass in reversed(cls.__mro__):
+                names = klass.__dict__.get('__slots__', ())
+                if type(names) is str:
+                    names = (names,)
+                slots += tuple(n for n in names if n not in (
+                    '__dict__', '__weakref__', '_json_cache'))
+            SLOTS[cls] = slots
+        return slots
+
+    @classmethod
+    def record(cls, fields: dict, now: str = None) -> RawRecord:
+        """ Stored form of an object of this class, as a lazy load keeps
+        it, without building the object: the slots of the class taken
+        from `fields` (to_json(True) form; __optional__ ones only when
+        set), with a new ID and `now` (the current time by default) as
+        missing timestamps. Classes whose objects have a __dict__ get an
+        instance. ValueError for an invalid timestamp
+        """
+        if cls.__dictoffset__:
+            return cls(**fields)
+        values = {name: fields.get(name) for name in cls.slots()
+                  if name not in cls.__optional__ or
+                  fields.get(name) is not None}
+        if values['id'] is None:
+            values['id'] = new_id()
+        for name in RawRecord.TIMESTAMPS:
+            value = values[name]
+            if value is None:
+                if now is None:
+                    now = format_timestamp(datetime.utcnow())
+                values[name] = now
+            elif type(value) is datetime:
+                values[name] = format_timestamp(value)
+            elif len(value) == 19 and value[10] == 'T':
+                # TIMESTAMP_FORMAT already: only checked
+                datetime.fromisoformat(value)
+            else:
+                values[name] = format_timestamp(
+                    datetime.fromisoformat(value))
+        return RawRecord(values)
+
+    def attributes(self) -> Iterable[tuple]:
+        """ (name, value) of every attribute set on the object
+        """
+        for key in self.__class__.slots():
+            value = getattr(self, key, UNSET)
+            if value is not UNSET:
+                yield key, value
+        yield from getattr(self, '__dict__', {}).items()
+
+    def __setattr__(self, name: str, value):
+        """ Set an attribute and drop the cached serialized forms
+        """
+        if OPEN_BATCHES and name != '_json_cache':
+            batch = getattr(BATCH, 'current', None)
+            if batch is not None:
+                self._snapshot(batch)
+        object.__setattr__(self, name, value)
+        if name != '_json_cache':
+            object.__setattr__(self, '_json_cache', None)
+
+    def _json_forms(self) -> dict:
+        """ Cached serialized forms of the object, built on demand
+        """
+        cache = getattr(self, '_json_cache', None)
+        if cache is None:
+            cache = {}
+            object.__setattr__(self, '_json_cache', cache)
+        return cache
+
     def to_json(self, for_serialization: bool = False) -> dict:
         """ Convert the object a JSON dictionary
         """
+        # only the API form is cached: the serialization form is used
+        # once per write and caching it would double the resident size
+        cache = None if for_serialization else self._json_forms()
+        if cache is not None and 'dict' in cache:
+            return dict(cache['dict'])
         result = {}
-        for key, value in self.__dict__.items():
+        for key, value in self.attributes():
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
-                result[key] = value.strftime(TIMESTAMP_FORMAT)
+                result[key] = format_timestamp(value)
             else:
                 result[key] = value
+        if cache is not None:
+            cache['dict'] = result
+            return dict(result)
         return result
 
+    def to_json_bytes(self) -> bytes:
+        """ to_json() encoded as UTF-8 JSON, as returned by the API
+        """
+        cache = self._json_forms()
+        result = cache.get('bytes')
+        if result is None:
+            result = json.dumps(self.to_json(), sort_keys=True,
+                                separators=(',', ':')).encode('utf-8')
+            cache['bytes'] = result
+        return result
+
+    @classmethod
+    def file_path(cls, serializer: str = None) -> str:
+        """ Path of the snapshot file of this class in the format of
+        `serializer` (the class one by default): .db_<Class>.json or
+        .db_<Class>.bin
+        """
+        extension = SERIALIZERS[serializer or cls.__serializer__].extension
+        return ".db_{}.{}".format(cls.__name__, extension)
+
+    @classmethod
+    def snapshot_path(cls) -> str:
+        """ Path of the snapshot to load: file_path(), or else the file of
+        another format (written before the format was changed), or None
+        """
+        names = [cls.__serializer__] + \
+            [name for name in SERIALIZERS if name != cls.__serializer__]
+        for name in names:
+            if path.exists(cls.file_path(name)):
+                return cls.file_path(name)
+        return None
+
+    @classmethod
+    def journal_path(cls) -> str:
+        """ Path of the append-only journal of this class
+        """
+        return ".db_{}.journal".format(cls.__name__)
+
+    @classmethod
+    def lock_path(cls) -> str:
+        """ Path of the file locked by writers in MODEL_SHARED mode
+        """
+        return ".db_{}.lock".format(cls.__name__)
+
+    @classmethod
+    @contextmanager
+    def _file_lock(cls, exclusive: bool):
+        """ Hold the flock of this class (exclusive for writers) in
+        MODEL_SHARED mode; nested calls keep the lock already held.
+        Callers hold class_lock, so one thread at a time gets here
+        """
+        s_class = cls.__name__
+        if not SHARED or s_class in FILE_LOCKS:
+            yield
+            return
+        # opened for each use: a descriptor inherited through fork()
+        # would share its lock with the parent
+        with open(cls.lock_path(), 'a') as f:
+            fcntl.flock(f.fileno(),
+                        fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            FILE_LOCKS[s_class] = f
+            try:
+                yield
+            finally:
+                del FILE_LOCKS[s_class]
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
     @classmethod
     def load_from_file(cls):
-        """ Load all objects from file
+        """ Load all objects from file, then replay the journal. A
+        snapshot in another format than the class one is rewritten in
+        that format
+        """
+        if STORAGE is not None:
+            STORAGE.load(cls)
+            return
+        s_class = cls.__name__
+        file_path = cls.snapshot_path()
+        with class_lock(s_class), cls._file_lock(False):
+            objs = {}
+            if file_path is not None and path.getsize(file_path) > 0:
+                # objects are built while the file is parsed, so the
+                # decoded records never coexist in full with the instances
+                with open(file_path, 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0,
+                                  access=mmap.ACCESS_READ) as m:
+                    for obj_id, obj_json in detect(m[:8]).load(m):
+                        if cls.__lazy__:
+                            for name in cls.__optional__:
+                                if name in obj_json and \
+                                        obj_json[name] is None:
+                                    del obj_json[name]
+                            objs[obj_id] = RawRecord(obj_json)
+                        else:
+                            objs[obj_id] = cls(**obj_json)
+            cls.replay_journal(objs)
+            DATA[s_class] = objs
+            CLASSES[s_class] = cls
+            if SHARED:
+                POSITIONS[s_class] = cls._journal_position()
+            if cls.__lazy__:
+                # built by the first search that needs them
+                INDEXES.pop(s_class, None)
+            else:
+                cls.reindex()
+        if file_path is not None and file_path != cls.file_path():
+            # once the shared file lock is released
+            cls.save_to_file()
+
+    @classmethod
+    def replay_journal(cls, objs: dict = None):
+        """ Apply every record of the journal to the loaded objects
+        (`objs`, DATA of the class by default)
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
+        if objs is None:
+            objs = DATA[s_class]
+        journal_path = cls.journal_path()
+        if not path.exists(journal_path):
             return
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        with open(journal_path, 'rb') as f:
+            cls._apply_journal(f, objs)
+
+    @classmethod
+    def _apply_journal(cls, f, objs: dict, indexes: list = None) -> int:
+        """ Apply the journal records read from `f` to `objs`, keeping
+        `indexes` up to date, and return the number of records applied
+        """
+        applied = 0
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # torn write at the end of the journal
+                break
+            if record.get('op') == 'save':
+                if cls.__lazy__:
+                    obj = RawRecord(record['obj'])
+                else:
+                    obj = cls(**record['obj'])
+                objs[obj.id] = obj
+                for index in indexes or ():
+                    index.add(obj)
+            elif record.get('op') == 'remove':
+                if objs.pop(record.get('id'), None) is None:
+                    continue
+                for index in indexes or ():
+                    index.discard(record.get('id'))
+            else:
+                # generation header
+                continue
+            applied += 1
+        return applied
+
+    @staticmethod
+    def _journal_generation(f) -> Tuple[int, int]:
+        """ Generation of an open journal and the offset of its first
+        record (journals without a header are generation 0)
+        """
+        f.seek(0)
+        try:
+            record = json.loads(f.readline())
+        except ValueError:
+            record = None
+        if type(record) is dict and record.get('op') == 'generation':
+            return record['generation'], f.tell()
+        return 0, 0
+
+    @classmethod
+    def _journal_position(cls) -> Tuple[int, int, int]:
+        """ (generation, inode, size) of the journal as it is now
+        """
+        try:
+            f = open(cls.journal_path(), 'rb')
+        except FileNotFoundError:
+            return 0, None, 0
+        with f:
+            generation, _ = cls._journal_generation(f)
+            stat = os.fstat(f.fileno())
+            return generation, stat.st_ino, stat.st_size
+
+    @classmethod
+    def _catch_up(cls) -> int:
+        """ Apply what other processes journaled since our last read,
+        with the class and file locks held. Return the number of records
+        applied (-1 when the class had to be loaded again)
+        """
+        s_class = cls.__name__
+        position = POSITIONS.get(s_class)
+        if position is None:
+            # class never loaded: nothing to bring up to date
+            POSITIONS[s_class] = cls._journal_position()
+            return 0
+        generation, _, offset = position
+        journal_path = cls.journal_path()
+        try:
+            f = open(journal_path, 'rb')
+        except FileNotFoundError:
+            return 0
+        indexes = INDEXES.get(s_class)
+        indexes = indexes['all'] if indexes is not None else None
+        objs = DATA[s_class]
+        applied = 0
+        with f:
+            current, start = cls._journal_generation(f)
+            if current == generation + 1:
+                # compacted once since: end of the previous journal first
+                try:
+                    with open(journal_path + ".prev", 'rb') as prev:
+                        if cls._journal_generation(prev)[0] == generation:
+                            prev.seek(offset)
+                            applied += cls._apply_journal(prev, objs,
+                                                          indexes)
+                            generation, offset = current, start
+                except FileNotFoundError:
+                    pass
+            if current != generation:
+                # the changes in between are only in the snapshot
+                cls.load_from_file()
+                return -1
+            f.seek(max(offset, start))
+            applied += cls._apply_journal(f, objs, indexes)
+            POSITIONS[s_class] = (current, os.fstat(f.fileno()).st_ino,
+                                  f.tell())
+        return applied
+
+    @classmethod
+    def sync(cls) -> int:
+        """ Apply the changes other processes made to this class since the
+        last call (MODEL_SHARED mode). Costs one stat() when nothing
+        changed. Return the number of records applied
+        """
+        if not SHARED or STORAGE is not None:
+            return 0
+        s_class = cls.__name__
+        position = POSITIONS.get(s_class)
+        if position is None:
+            return 0
+        try:
+            stat = os.stat(cls.journal_path())
+            current = (stat.st_ino, stat.st_size)
+        except FileNotFoundError:
+            current = (None, 0)
+        if current == position[1:]:
+            return 0
+        with class_lock(s_class), cls._file_lock(False):
+            return cls._catch_up()
+
+    @staticmethod
+    def sync_all() -> int:
+        """ sync() every loaded class, at most once per
+        MODEL_SYNC_INTERVAL seconds
+        """
+        global LAST_SYNC
+        if not SHARED:
+            return 0
+        now = time.monotonic()
+        if SYNC_INTERVAL > 0 and now - LAST_SYNC < SYNC_INTERVAL:
+            return 0
+        LAST_SYNC = now
+        return sum(max(0, klass.sync()) for klass in list(CLASSES.values()))
+
+    @staticmethod
+    def freeze():
+        """ Get the loaded classes ready to be shared by forked workers
+        (call once in the pre-fork master): objects become compact
+        records, indexes are built, gc.freeze() keeps the collector from
+        writing to their pages, and DATA of each class becomes an Overlay
+        taking the changes of each worker
+        """
+        for s_class, klass in list(CLASSES.items()):
+            with class_lock(s_class):
+                objs = DATA[s_class]
+                if type(objs) is Overlay:
+                    continue
+                frozen = {}
+                for obj_id, obj in objs.items():
+                    if type(obj) is not RawRecord:
+                        obj = RawRecord(obj.to_json(True))
+                    frozen[obj_id] = obj
+                DATA[s_class] = Overlay(frozen)
+                klass.reindex()
+        gc.collect()
+        gc.freeze()
+
+    @classmethod
+    def _rotate_journal(cls):
+        """ Start the next journal generation once the snapshot holds
+        every change, keeping the current journal as .journal.prev
+        """
+        s_class = cls.__name__
+        journal_path = cls.journal_path()
+        generation = POSITIONS.get(s_class, (0,))[0] + 1
+        header = json.dumps({'op': 'generation',
+                             'generation': generation}) + "\n"
+        tmp_path = journal_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(header)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(journal_path, journal_path + ".prev")
+        os.replace(tmp_path, journal_path)
+        fsync_directory(path.dirname(journal_path))
+        POSITIONS[s_class] = (generation, os.stat(journal_path).st_ino,
+                              len(header.encode('utf-8')))
+
+    @classmethod
+    def _indexes(cls) -> dict:
+        """ Every index of this class: {'all': [...], 'hash': {attribute:
+        HashIndex}, 'ordered': {attribute: OrderedIndex}, 'stats': {name:
+        Histogram}}
+        """
+        s_class = cls.__name__
+        indexes = INDEXES.get(s_class)
+        if indexes is not None:
+            return indexes
+        with class_lock(s_class):
+            if INDEXES.get(s_class) is None:
+                indexes = {'all': [], 'hash': {}, 'ordered': {},
+                           'stats': {}}
+                for spec in cls.__indexes__:
+                    if type(spec) is str:
+                        index = HashIndex(spec)
+                    else:
+                        index = copy.copy(spec)
+                        index.clear()
+                    indexes['hash'][index.attribute] = index
+                for spec in cls.__stats__:
+                    histogram = copy.copy(spec)
+                    histogram.clear()
+                    indexes['stats'][histogram.name] = histogram
+                indexes['all'] = list(indexes['hash'].values()) + \
+                    list(indexes['ordered'].values()) + \
+                    list(indexes['stats'].values())
+                objs = list(DATA.get(s_class, {}).values())
+                for index in indexes['all']:
+                    index.build(objs)
+                # published once complete: readers never see it filling up
+                INDEXES[s_class] = indexes
+            return INDEXES[s_class]
+
+    @classmethod
+    def indexes(cls) -> dict:
+        """ Secondary indexes of this class, by attribute name
+        """
+        return cls._indexes()['hash']
+
+    @classmethod
+    def ordered_index(cls, attribute: str) -> OrderedIndex:
+        """ Ordered index of `attribute` (None if it is not declared in
+        __ordered_indexes__), built on first use: declared indexes that
+        nothing sorts or ranges on cost nothing
+        """
+        index = cls._indexes()['ordered'].get(attribute)
+        if index is not None or attribute not in cls.__ordered_indexes__:
+            return index
+        s_class = cls.__name__
+        with class_lock(s_class):
+            indexes = cls._indexes()
+            index = indexes['ordered'].get(attribute)
+            if index is None:
+                index = OrderedIndex(
+                    attribute, parse_timestamp
+                    if attribute in RawRecord.TIMESTAMPS else None)
+                index.build(list(DATA.get(s_class, {}).values()))
+                # new lists: readers keep iterating the ones they have
+                indexes['all'] = indexes['all'] + [index]
+                indexes['ordered'] = dict(indexes['ordered'],
+                                          **{attribute: index})
+            return index
+
+    @classmethod
+    def ordered_indexes(cls) -> dict:
+        """ Ordered indexes of this class, by attribute name
+        """
+        return {attribute: cls.ordered_index(attribute)
+                for attribute in cls.__ordered_indexes__}
+
+    @classmethod
+    def case_insensitive(cls, attribute: str) -> HashIndex:
+        """ Declared hash index of `attribute` if it is case-insensitive,
+        else None
+        """
+        for spec in cls.__indexes__:
+            if type(spec) is not str and spec.attribute == attribute and \
+                    getattr(spec, 'case_insensitive', False):
+                return spec
+        return None
+
+    @classmethod
+    def normalizer(cls, attribute: str) -> Callable[[Any], Any]:
+        """ Form in which values of `attribute` are compared for equality:
+        the key of its hash index if that one is case-insensitive,
+        comparable() otherwise
+        """
+        index = cls.case_insensitive(attribute)
+        return comparable if index is None else index.key
+
+    @classmethod
+    def reindex(cls):
+        """ Rebuild all indexes of this class from DATA
+        """
+        with class_lock(cls.__name__):
+            INDEXES.pop(cls.__name__, None)
+            cls._indexes()
 
     @classmethod
     def save_to_file(cls):
-        """ Save all objects to file
+        """ Save all objects to file: serialized in memory, then written
+        to a temporary file, synced and renamed over the snapshot; the
+        file is not touched when the content is the same as the last
+        snapshot written
+        """
+        if STORAGE is not None:
+            # every change is already committed to the database
+            return
+        s_class = cls.__name__
+        file_path = cls.file_path()
+        tmp_path = file_path + ".tmp"
+        with class_lock(s_class), cls._file_lock(True):
+            if SHARED:
+                # the snapshot must hold what the others journaled too
+                cls._catch_up()
+            writer = HashingWriter()
+            SERIALIZERS[cls.__serializer__].dump(
+                list(DATA[s_class].values()), writer)
+            digest = writer.sha256.hexdigest()
+            if DIGESTS.get(s_class) != digest or not path.exists(file_path):
+                with open(tmp_path, 'wb') as f:
+                    f.writelines(writer.chunks)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, file_path)
+                fsync_directory(path.dirname(file_path))
+                DIGESTS[s_class] = digest
+            for name in SERIALIZERS:
+                if name != cls.__serializer__ and \
+                        path.exists(cls.file_path(name)):
+                    # superseded by this snapshot
+                    os.remove(cls.file_path(name))
+            if cls.__journal__ and path.exists(cls.journal_path()):
+                # the snapshot now holds every journaled change
+                if SHARED:
+                    cls._rotate_journal()
+                else:
+                    open(cls.journal_path(), 'w').close()
+
+    @classmethod
+    def compact(cls):
+        """ Fold the journal back into the snapshot file
+        """
+        cls.save_to_file()
+
+    @classmethod
+    def _persist(cls, records: List[dict], sync: bool = False):
+        """ Write changes to disk: full snapshot or journal append
+        (synced to disk when `sync` is set)
+        """
+        if not cls.__journal__:
+            cls.save_to_file()
+            return
+
+        s_class = cls.__name__
+        lines = "".join(json.dumps(r) + "\n" for r in records)
+        with class_lock(s_class), cls._file_lock(True):
+            if SHARED and cls._catch_up() < 0:
+                # loaded again from the files: add back our changes
+                indexes = INDEXES.get(s_class)
+                cls._apply_journal(lines.splitlines(), DATA[s_class],
+                                   indexes['all'] if indexes else None)
+            with open(cls.journal_path(), 'a') as f:
+                f.write(lines)
+                journal_size = f.tell()
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
+                if SHARED:
+                    POSITIONS[s_class] = (POSITIONS[s_class][0],
+                                          os.fstat(f.fileno()).st_ino,
+                                          journal_size)
+
+            snapshot_size = 0
+            if path.exists(cls.file_path()):
+                snapshot_size = path.getsize(cls.file_path())
+            if journal_size > max(JOURNAL_COMPACT_SIZE, snapshot_size):
+                cls.compact()
+
+    @classmethod
+    def _commit(cls, records: List[dict]):
+        """ Persist records now, or hand them to the background flusher
+        """
+        flusher = Base.flusher()
+        if flusher is None:
+            cls._persist(records)
+        else:
+            flusher.submit(cls, records)
+
+    def _snapshot(self, batch: dict):
+        """ Keep the stored fields of this object for the rollback of
+        `batch`, before its first change in the batch (stored objects
+        are modified in place)
+        """
+        obj_id = getattr(self, 'id', None)
+        key = (self.__class__, obj_id)
+        if key in batch['undo'] or obj_id is None or \
+                DATA.get(self.__class__.__name__, {}).get(obj_id) is not self:
+            return
+        batch['undo'][key] = self.to_json(True)
+
+    @classmethod
+    def _write(cls, previous: TypeVar('Base'), record: dict):
+        """ Persist one change, or queue it in the open batch along with
+        the fields DATA held for its ID before the batch
+        """
+        batch = getattr(BATCH, 'current', None)
+        if batch is None:
+            cls._commit([record])
+            return
+        undo = batch['undo']
+        if (cls, record['id']) not in undo:
+            undo[(cls, record['id'])] = \
+                None if previous is None else previous.to_json(True)
+        batch['records'].setdefault(cls, []).append(record)
+
+    @staticmethod
+    def flusher() -> Flusher:
+        """ Background flusher, started on first use when
+        MODEL_FLUSH_INTERVAL is set (None otherwise)
+        """
+        global FLUSHER
+        if FLUSHER is None and FLUSH_INTERVAL > 0:
+            FLUSHER = Flusher(
+                lambda cls, records: cls._persist(records, sync=True),
+                FLUSH_INTERVAL)
+            FLUSHER.start()
+            atexit.register(FLUSHER.flush)
+        return FLUSHER
+
+    @staticmethod
+    def flush(timeout: float = None) -> bool:
+        """ Write the changes waiting in the flusher and wait for them
+        """
+        if FLUSHER is None:
+            return True
+        return FLUSHER.flush(timeout)
+
+    @staticmethod
+    def wait_durable(timeout: float = None) -> bool:
+        """ Wait until every change saved so far is synced to disk
+        """
+        if FLUSHER is not None:
+            return FLUSHER.wait_durable(timeout=timeout)
+        for s_class in list(DATA.keys()):
+            journal_path = ".db_{}.journal".format(s_class)
+            if path.exists(journal_path):
+                with open(journal_path, 'a') as f:
+                    os.fsync(f.fileno())
+        return True
+
+    @classmethod
+    @contextmanager
+    def batch(cls):
+        """ Collect every save/remove of the block and write each class
+        once on exit. If the block raises, nothing is written and DATA and
+        the indexes get back what they held before the block: objects
+        rebuilt from the fields they had before their first change in the
+        block (instances held by the caller keep their changes).
+        """
+        if STORAGE is not None:
+            with STORAGE.transaction():
+                yield
+            return
+        if getattr(BATCH, 'current', None) is not None:
+            # nested batches join the outermost one
+            yield
+            return
+
+        global OPEN_BATCHES
+        BATCH.current = {'records': {}, 'undo': {}}
+        with OPEN_BATCHES_LOCK:
+            OPEN_BATCHES += 1
+        try:
+            yield
+        except BaseException:
+            batch, BATCH.current = BATCH.current, None
+            for (klass, obj_id), fields in batch['undo'].items():
+                with class_lock(klass.__name__):
+                    objs = DATA[klass.__name__]
+                    indexes = klass._indexes()['all']
+                    for index in indexes:
+                        index.discard(obj_id)
+                    if fields is None:
+                        objs.pop(obj_id, None)
+                        continue
+                    obj = klass(**fields)
+                    objs[obj_id] = obj
+                    for index in indexes:
+                        index.add(obj)
+            raise
+        finally:
+            with OPEN_BATCHES_LOCK:
+                OPEN_BATCHES -= 1
+        batch, BATCH.current = BATCH.current, None
+        for klass, records in batch['records'].items():
+            s_class = klass.__name__
+            with class_lock(s_class):
+                # write what DATA holds now: another thread may have
+                # saved one of these objects since it was queued
+                ids = list(dict.fromkeys(r['id'] for r in records))
+                records = []
+                for obj_id in ids:
+                    obj = DATA[s_class].get(obj_id)
+                    if obj is None:
+                        records.append({'op': 'remove', 'id': obj_id})
+                    else:
+                        records.append({'op': 'save', 'id': obj_id,
+                                        'obj': obj.to_json(True)})
+                klass._commit(records)
+
+    @classmethod
+    def save_many(cls, objs: Iterable[TypeVar('Base')]):
+        """ Save several objects with one write per class
+        """
+        with cls.batch():
+            for obj in objs:
+                obj.save()
+
+    @classmethod
+    def import_many(cls, objs: Iterable[TypeVar('Base')],
+                    chunk_size: int = 10000) -> int:
+        """ Store objects of this class as they are (unlike save(),
+        updated_at is kept) and return how many were stored. Objects are
+        journaled `chunk_size` at a time, or written in one snapshot at
+        the end for a class without journal. Once the import outnumbers
+        a quarter of the objects stored before it, the indexes are
+        dropped, to be built once on first use rather than updated object
+        by object. The class lock is held throughout
         """
+        if STORAGE is not None:
+            count = 0
+            with STORAGE.transaction():
+                for obj in objs:
+                    STORAGE.save(obj)
+                    count += 1
+            return count
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        with class_lock(s_class):
+            stored = DATA[s_class]
+            threshold = len(stored) // 4
+            batch = getattr(BATCH, 'current', None)
+            records = []
+            count = 0
+            for obj in objs:
+                previous = stored.get(obj.id)
+                stored[obj.id] = obj
+                count += 1
+                indexes = INDEXES.get(s_class)
+                if indexes is not None:
+                    if count > threshold:
+                        # built again from DATA on first use
+                        INDEXES.pop(s_class, None)
+                    else:
+                        for index in indexes['all']:
+                            index.add(obj)
+                if batch is not None:
+                    cls._write(previous, {'op': 'save', 'id': obj.id})
+                elif cls.__journal__:
+                    records.append({'op': 'save', 'id': obj.id,
+                                    'obj': obj.to_json(True)})
+                    if len(records) >= chunk_size:
+                        cls._commit(records)
+                        records = []
+            if batch is None:
+                if records:
+                    cls._commit(records)
+                elif not cls.__journal__ and count > 0:
+                    cls.save_to_file()
+        return count
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @classmethod
+    def remove_many(cls, objs: Iterable[TypeVar('Base')]):
+        """ Remove several objects with one write per class
+        """
+        with cls.batch():
+            for obj in objs:
+                obj.remove()
 
     def save(self):
         """ Save current object
         """
         s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        if STORAGE is not None:
+            STORAGE.save(self)
+            return
+        with class_lock(s_class):
+            previous = DATA[s_class].get(self.id)
+            DATA[s_class][self.id] = self
+            for index in self.__class__._indexes()['all']:
+                index.add(self)
+            record = {'op': 'save', 'id': self.id}
+            if getattr(BATCH, 'current', None) is None:
+                # a batch writes what DATA holds when it ends
+                record['obj'] = self.to_json(True)
+            self.__class__._write(previous, record)
 
     def remove(self):
         """ Remove object
         """
+        if STORAGE is not None:
+            STORAGE.remove(self)
+            return
         s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
+        with class_lock(s_class):
+            previous = DATA[s_class].get(self.id)
+            if previous is None:
+                return
             del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+            for index in self.__class__._indexes()['all']:
+                index.discard(self.id)
+            self.__class__._write(previous, {'op': 'remove', 'id': self.id})
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
+        if STORAGE is not None:
+            return STORAGE.count(cls)
         s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return len(DATA[s_class])
+
+    @classmethod
+    def stats(cls) -> dict:
+        """ Number of objects and summary of each counter of __stats__,
+        maintained on save/remove (counters are not kept by the SQLite
+        engine)
+        """
+        result = {'count': cls.count()}
+        if STORAGE is not None:
+            return result
+        for name, histogram in cls._indexes()['stats'].items():
+            result[name] = histogram.summary()
+        return result
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -118,20 +1145,67 @@ class Base():
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
+        if STORAGE is not None:
+            return STORAGE.get(cls, id)
         s_class = cls.__name__
-        return DATA[s_class].get(id)
+        obj = DATA[s_class].get(id)
+        if type(obj) is RawRecord:
+            return cls._hydrate(obj)
+        return obj
+
+    @classmethod
+    def _hydrate(cls, record: RawRecord) -> TypeVar('Base'):
+        """ Instance of a lazily loaded record, built once and kept in
+        DATA in place of the record (in the overlay of a forked worker)
+        """
+        s_class = cls.__name__
+        obj = cls(**record.fields())
+        with class_lock(s_class):
+            objs = DATA[s_class]
+            current = objs.get(obj.id)
+            if current is record:
+                if type(objs) is Overlay:
+                    # kept by this worker only: the shared snapshot keeps
+                    # the record and its pages are not copied
+                    objs.hydrated[obj.id] = obj
+                else:
+                    objs[obj.id] = obj
+                return obj
+            if current is not None and type(current) is not RawRecord:
+                # built meanwhile by another thread
+                return current
+        return obj
+
+    @classmethod
+    def query(cls) -> TypeVar('Query'):
+        """ Query over the objects of this class (see models.query)
+        """
+        from models.query import Query
+        return Query(cls)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
         """
+        return cls.query().where(attributes).all()
+
+    @classmethod
+    def page(cls, sort: str, cursor: str = None, limit: int = None,
+             reverse: bool = False) -> Tuple[List[TypeVar('Base')], str]:
+        """ Objects ordered by the ordered index on `sort`, starting after
+        `cursor`, and the cursor of the next page (None on the last one).
+        Raise KeyError for an attribute without ordered index and
+        ValueError for an invalid cursor
+        """
+        if STORAGE is not None:
+            if sort not in cls.__ordered_indexes__:
+                raise KeyError(sort)
+            return STORAGE.page(cls, sort, cursor, limit, reverse)
         s_class = cls.__name__
-        def _search(obj):
-            if len(attributes) == 0:
-                return True
-            for k, v in attributes.items():
-                if (getattr(obj, k) != v):
-                    return False
-            return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+        index = cls.ordered_index(sort)
+        if index is None:
+            raise KeyError(sort)
+        ids, next_cursor = index.page(cursor, limit, reverse)
+        objs = [DATA[s_class].get(i) for i in ids]
+        return [cls._hydrate(o) if type(o) is RawRecord else o
+                for o in objs if o is not None], next_cursor
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+""" Bulk module: stream users from and to JSONL or CSV files
+
+    python3 -m models.bulk import users.jsonl
+    python3 -m models.bulk export users.csv
+
+Imported rows hold the fields of User.to_json(True); a "password" field
+is hashed (by parallel processes) into "_password". Empty CSV cells are
+None, and the cells of INTEGERS are read as integers.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Iterable, Iterator, List, TextIO
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from models import base
+from models.user import User
+
+
+FIELDS = ('id', 'email', '_password', 'first_name', 'last_name',
+          '_session_generation', 'created_at', 'updated_at')
+INTEGERS = ('_session_generation',)
+FORMATS = ('jsonl', 'csv')
+
+
+class Progress():
+    """ Progress readout on stderr, refreshed at most every `interval`
+    seconds
+    """
+
+    def __init__(self, verb: str, total: int = None, quiet: bool = False,
+                 interval: float = 0.5):
+        """ Initialize a readout of `total` (if known) objects
+        """
+        self.verb = verb
+        self.total = total
+        self.quiet = quiet
+        self.interval = interval
+        self.done = 0
+        self.start = time.perf_counter()
+        self.shown = self.start
+
+    def line(self) -> str:
+        """ Current readout
+        """
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0
+        if self.total:
+            return "{} {}/{} users ({:.0%}, {:.0f}/s)".format(
+                self.verb, self.done, self.total, self.done / self.total,
+                rate)
+        return "{} {} users ({:.0f}/s)".format(self.verb, self.done, rate)
+
+    def update(self, count: int = 1):
+        """ Count `count` more objects
+        """
+        self.done += count
+        now = time.perf_counter()
+        if not self.quiet and now - self.shown >= self.interval:
+            self.shown = now
+            sys.stderr.write("\r" + self.line())
+            sys.stderr.flush()
+
+    def finish(self):
+        """ Print the final readout
+        """
+        if not self.quiet:
+            sys.stderr.write("\r" + self.line() + "\n")
+            sys.stderr.flush()
+
+
+def file_format(file_path: str, name: str = None) -> str:
+    """ Format given by `name`, or else by the file extension
+    """
+    if name is None:
+        name = os.path.splitext(file_path)[1].lstrip('.').lower()
+        if name in ('json', 'ndjson', ''):
+            name = 'jsonl'
+    if name not in FORMATS:
+        raise ValueError("Unknown format: {}".format(name))
+    return name
+
+
+def read_rows(f: TextIO, fmt: str) -> Iterator[dict]:
+    """ Rows of a JSONL or CSV file, one at a time
+    """
+    if fmt == 'csv':
+        for row in csv.DictReader(f):
+            row = {k: v for k, v in row.items() if v != ''}
+            for name in INTEGERS:
+                if name in row:
+                    row[name] = int(row[name])
+            yield row
+        return
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def chunks(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    """ Lists of `size` rows (the last one may be shorter)
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """ Stored form of each password (run by the pool processes)
+    """
+    return [User.hash_password(pwd) for pwd in passwords]
+
+
+def plain_passwords(chunk: List[dict]) -> List[str]:
+    """ Passwords to hash in a chunk, in row order
+    """
+    return [row['password'] for row in chunk
+            if type(row.get('password')) is str]
+
+
+def with_hashes(chunk: List[dict], hashes: List[str]) -> List[dict]:
+    """ Replace the "password" of the rows by its hash
+    """
+    hashes = iter(hashes)
+    for row in chunk:
+        if 'password' in row:
+            if type(row['password']) is str:
+                row['_password'] = next(hashes)
+            del row['password']
+    return chunk
+
+
+def hashed_chunks(rows: Iterable[dict], size: int,
+                  workers: int) -> Iterator[List[dict]]:
+    """ Chunks of rows with their passwords hashed, by `workers`
+    processes working a few chunks ahead of the caller (inline if
+    `workers` < 2)
+    """
+    if workers < 2:
+        for chunk in chunks(rows, size):
+            yield with_hashes(chunk, hash_passwords(plain_passwords(chunk)))
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for chunk in chunks(rows, size):
+            pending.append((chunk, pool.submit(hash_passwords,
+                                               plain_passwords(chunk))))
+            # bounded read-ahead: memory does not grow with the file
+            if len(pending) > 2 * workers:
+                chunk, hashes = pending.popleft()
+                yield with_hashes(chunk, hashes.result())
+        while pending:
+            chunk, hashes = pending.popleft()
+            yield with_hashes(chunk, hashes.result())
+
+
+def import_users(f: TextIO, fmt: str, batch_size: int = 10000,
+                 workers: int = None, progress: Progress = None) -> int:
+    """ Store the users of a file, journaled `batch_size` at a time, and
+    return how many were imported
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if progress is None:
+        progress = Progress("imported", quiet=True)
+
+    def users() -> Iterator[base.RawRecord]:
+        # stored as lazily loaded records: built on first use
+        for chunk in hashed_chunks(read_rows(f, fmt), batch_size, workers):
+            now = base.format_timestamp(datetime.utcnow())
+            for row in chunk:
+                yield User.record(row, now)
+            progress.update(len(chunk))
+
+    count = User.import_many(users(), batch_size)
+    User.flush()
+    progress.finish()
+    return count
+
+
+def stored_records(page_size: int = 1000) -> Iterator[dict]:
+    """ to_json(True) of every user: read one page at a time from the
+    SQLite engine, from a copy of the references held by DATA otherwise
+    """
+    if base.STORAGE is not None:
+        cursor = None
+        while True:
+            users, cursor = User.page('created_at', cursor, page_size)
+            for user in users:
+                yield user.to_json(True)
+            if cursor is None:
+                return
+    # list() copies the references atomically: saves and removes made
+    # during the export do not disturb it
+    for obj in list(base.DATA[User.__name__].values()):
+        yield obj.to_json(True)
+
+
+def export_users(f: TextIO, fmt: str, page_size: int = 1000,
+                 progress: Progress = None) -> int:
+    """ Write every user to a file and return how many were exported
+    """
+    if progress is None:
+        progress = Progress("exported", quiet=True)
+    if fmt == 'csv':
+        writer = csv.DictWriter(f, FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(record: dict):
+            f.write(json.dumps(record) + "\n")
+    for record in stored_records(page_size):
+        write(record)
+        progress.update()
+    progress.finish()
+    return progress.done
+
+
+def main(argv: List[str] = None) -> int:
+    """ Command line entry point
+    """
+    parser = argparse.ArgumentParser(
+        prog="python3 -m models.bulk",
+        description="Import or export users as JSONL or CSV")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for command in ('import', 'export'):
+        sub = commands.add_parser(command,
+                                  help="{} users".format(command))
+        sub.add_argument('file', help="JSONL or CSV file, - for std{}"
+                         .format('in' if command == 'import' else 'out'))
+        sub.add_argument('--format', choices=FORMATS,
+                         help="file format (default: from the extension)")
+        sub.add_argument('--quiet', action='store_true',
+                         help="no progress readout")
+    commands.choices['import'].add_argument(
+        '--batch-size', type=int, default=10000,
+        help="users hashed and journaled together (default: 10000)")
+    commands.choices['import'].add_argument(
+        '--workers', type=int, default=os.cpu_count() or 1,
+        help="password hashing processes (default: CPU count)")
+    commands.choices['export'].add_argument(
+        '--page-size', type=int, default=1000,
+        help="users read at a time (default: 1000)")
+    args = parser.parse_args(argv)
+
+    try:
+        fmt = file_format(args.file, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    # stored records are all the CLI needs: no object gets built
+    User.__lazy__ = True
+    User.load_from_file()
+    if args.command == 'import':
+        progress = Progress("imported", quiet=args.quiet)
+        if args.file == '-':
+            import_users(sys.stdin, fmt, args.batch_size, args.workers,
+                         progress)
+        else:
+            with open(args.file, newline='') as f:
+                import_users(f, fmt, args.batch_size, args.workers,
+                             progress)
+    else:
+        progress = Progress("exported", User.count(), quiet=args.quiet)
+        if args.file == '-':
+            export_users(sys.stdout, fmt, args.page_size, progress)
+        else:
+            with open(args.file, 'w', newline='') as f:
+                export_users(f, fmt, args.page_size, progress)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
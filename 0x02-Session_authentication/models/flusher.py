@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+""" Flusher module: background group commit of model changes
+"""
+from typing import Any, Callable, List
+import threading
+import time
+
+
+class Flusher(threading.Thread):
+    """ Writer thread coalescing the changes submitted during `window`
+    seconds into one write per class
+    """
+
+    def __init__(self, persist: Callable[[Any, List[dict]], None],
+                 window: float = 0.05):
+        """ Initialize the flusher; `persist(cls, records)` does the write
+        """
+        super().__init__(name="model-flusher", daemon=True)
+        self.window = window
+        self._persist = persist
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._submitted = 0
+        self._durable = 0
+        self._flushing = False
+        self._cycles_started = 0
+        self._cycles_done = 0
+        self._failed = 0
+        self._error = None
+
+    def submit(self, cls: Any, records: List[dict]) -> int:
+        """ Queue records of `cls`; a later record for the same ID
+        replaces the pending one. Return the change generation
+        """
+        with self._cond:
+            pending = self._pending.setdefault(cls, {})
+            for record in records:
+                pending.pop(record['id'], None)
+                pending[record['id']] = record
+            self._submitted += 1
+            self._cond.notify_all()
+            return self._submitted
+
+    def run(self):
+        """ Write pending changes every `window` seconds
+        """
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.window
+                while not self._flushing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                pending, self._pending = self._pending, {}
+                generation = self._submitted
+                self._cycles_started += 1
+            failed = {}
+            error = None
+            for cls, records in pending.items():
+                try:
+                    self._persist(cls, list(records.values()))
+                except Exception as e:
+                    failed[cls] = records
+                    error = e
+            with self._cond:
+                if error is None:
+                    self._durable = generation
+                    if generation >= self._failed:
+                        self._error = None
+                else:
+                    # retried on the next cycle, behind the records
+                    # submitted since for the same IDs
+                    for cls, records in failed.items():
+                        newer = self._pending.get(cls, {})
+                        for obj_id in newer:
+                            records.pop(obj_id, None)
+                        records.update(newer)
+                        self._pending[cls] = records
+                    self._failed = generation
+                    self._error = error
+                self._cycles_done += 1
+                self._flushing = False
+                self._cond.notify_all()
+
+    def wait_durable(self, generation: int = None,
+                     timeout: float = None) -> bool:
+        """ Wait until `generation` (default: everything submitted so
+        far) is on disk. Return False on timeout, or while the last write
+        of `generation` failed and no later one has covered it
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if generation is None:
+                generation = self._submitted
+            return self._wait_durable(generation, deadline)
+
+    def flush(self, timeout: float = None) -> bool:
+        """ Write pending changes now (retrying failed ones) and wait
+        for them
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            generation = self._submitted
+            if self._pending:
+                self._flushing = True
+                self._cond.notify_all()
+                # the next cycle to start takes what is pending now
+                cycle = self._cycles_started + 1
+                while self._cycles_done < cycle:
+                    if not self._wait(deadline):
+                        return False
+            return self._wait_durable(generation, deadline)
+
+    def _wait_durable(self, generation: int, deadline: float) -> bool:
+        """ wait_durable, holding the condition
+        """
+        while self._durable < generation:
+            if self._failed >= generation:
+                return False
+            if not self._wait(deadline):
+                return False
+        return True
+
+    def _wait(self, deadline: float = None) -> bool:
+        """ Wait for a change of state, holding the condition. Return
+        False if `deadline` has passed
+        """
+        remaining = None
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+        self._cond.wait(remaining)
+        return True
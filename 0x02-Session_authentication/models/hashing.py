@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+""" Hashing module: password hashing run off the request threads, by a
+bounded pool of threads or processes, when enabled
+
+    PASSWORD_HASH_EXECUTOR  inline (default: in the calling thread),
+                            thread or process
+    PASSWORD_HASH_WORKERS   threads or processes (default: CPU count)
+    PASSWORD_HASH_QUEUE     hashes waiting for a worker before callers
+                            block (default: 4 per worker)
+    PASSWORD_HASH_TIMEOUT   seconds a caller blocks on a full queue before
+                            HashingBusy is raised (default: 5)
+
+A thread pool is enough for hash functions releasing the GIL (hashlib's
+pbkdf2_hmac and scrypt, bcrypt); a process pool also runs the others in
+parallel, for the cost of pickling the arguments. A pool only pays off
+for a slow hash (a KDF): the SHA-256 of User.hash_password takes about
+2 µs inline and 30 µs through a pool, hence the inline default.
+"""
+from concurrent.futures import (Executor, ProcessPoolExecutor,
+                                ThreadPoolExecutor)
+from typing import Any, Callable
+import os
+import threading
+
+
+EXECUTORS = ('inline', 'thread', 'process')
+
+
+class HashingBusy(Exception):
+    """ Raised when the hashing queue stayed full for the whole timeout
+    """
+
+
+class HashingService():
+    """ Runs hash functions on `workers` threads or processes, at most
+    `workers + queue_size` at a time: callers beyond that wait for a slot
+    (backpressure) and get HashingBusy after `timeout` seconds.
+
+    The pool is started on first use, and again in a forked child, so a
+    pre-fork master (see gunicorn.conf.py) hands no thread to its workers
+    """
+
+    def __init__(self, executor: str = None, workers: int = None,
+                 queue_size: int = None, timeout: float = None):
+        """ Initialize a service (the pool is not started yet)
+        """
+        if executor is None:
+            executor = os.getenv('PASSWORD_HASH_EXECUTOR', 'inline')
+        if executor not in EXECUTORS:
+            raise ValueError("Unknown executor: {}".format(executor))
+        if workers is None:
+            workers = int(os.getenv('PASSWORD_HASH_WORKERS', '0')) or \
+                os.cpu_count() or 1
+        if queue_size is None:
+            queue_size = int(os.getenv('PASSWORD_HASH_QUEUE',
+                                       str(4 * workers)))
+        if timeout is None:
+            timeout = float(os.getenv('PASSWORD_HASH_TIMEOUT', '5'))
+        self.executor = executor
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        """ Forget the pool and the counters (new service, or forked)
+        """
+        self._pool = None
+        self._pid = os.getpid()
+        self._slots = threading.BoundedSemaphore(self.workers +
+                                                 self.queue_size)
+        self.completed = 0
+        self.rejected = 0
+
+    def _executor(self) -> Executor:
+        """ Pool of this process, started on first use
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # forked: the parent's pool threads do not exist here
+                self._reset()
+            if self._pool is None:
+                if self.executor == 'process':
+                    self._pool = ProcessPoolExecutor(self.workers)
+                else:
+                    self._pool = ThreadPoolExecutor(
+                        self.workers, thread_name_prefix='hashing')
+            return self._pool
+
+    def _done(self, future: Any):
+        """ Free the slot of a finished hash
+        """
+        self.completed += 1
+        self._slots.release()
+
+    def run(self, function: Callable[..., Any], *args: Any) -> Any:
+        """ function(*args) computed by the pool, the caller waiting for
+        the result (without holding the GIL)
+        """
+        if self.executor == 'inline':
+            return function(*args)
+        pool = self._executor()
+        if not self._slots.acquire(timeout=self.timeout):
+            self.rejected += 1
+            raise HashingBusy("{} hashes already pending".format(
+                self.workers + self.queue_size))
+        try:
+            future = pool.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._done)
+        return future.result()
+
+    def shutdown(self, wait: bool = True):
+        """ Stop the pool (restarted by the next hash)
+        """
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait)
+            self._pool = None
+
+    def stats(self) -> dict:
+        """ Configuration and counters
+        """
+        pending = self.workers + self.queue_size - self._slots._value
+        return {
+            'executor': self.executor,
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'pending': pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+        }
+
+
+SERVICE = None
+SERVICE_LOCK = threading.Lock()
+
+
+def service() -> HashingService:
+    """ Service shared by the models, configured from the environment
+    """
+    global SERVICE
+    if SERVICE is None:
+        with SERVICE_LOCK:
+            if SERVICE is None:
+                SERVICE = HashingService()
+    return SERVICE
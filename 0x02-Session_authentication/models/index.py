@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+""" Index module: secondary indexes kept in sync by models.base.Base
+"""
+from datetime import datetime
+from typing import Any, Callable, Iterable, List, Set, Tuple
+import base64
+import bisect
+import json
+import sys
+
+
+class Top():
+    """ Sorts after any other value: (key, TOP) bounds every (key, ID)
+    """
+
+    def __lt__(self, other: Any) -> bool:
+        """ Never lower
+        """
+        return False
+
+    def __gt__(self, other: Any) -> bool:
+        """ Always greater
+        """
+        return True
+
+
+TOP = Top()
+
+
+def prefix_bounds(prefix: str) -> Tuple[str, str]:
+    """ [low, high) bounds of the strings starting with `prefix` (high
+    is None, unbounded, for an empty prefix or one ending in the last
+    code point, which has no successor)
+    """
+    if len(prefix) == 0 or prefix[-1] == chr(sys.maxunicode):
+        return prefix, None
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class HashIndex():
+    """ Hash index mapping an attribute value to the IDs holding it
+    """
+
+    def __init__(self, attribute: str, case_insensitive: bool = False):
+        """ Initialize an empty index on `attribute`
+        """
+        self.attribute = attribute
+        self.case_insensitive = case_insensitive
+        self.clear()
+
+    def clear(self):
+        """ Drop every entry of the index
+        """
+        self._ids = {}
+        self._keys = {}
+
+    def build(self, objs: Iterable[Any]):
+        """ Index every object of `objs` into an empty index
+        """
+        for obj in objs:
+            self.add(obj)
+
+    def key(self, value: Any) -> Any:
+        """ Normalize a value into its index key
+        """
+        if type(value) is datetime:
+            return value.isoformat()
+        if self.case_insensitive and type(value) is str:
+            return value.lower()
+        return value
+
+    def add(self, obj: Any):
+        """ Index (or re-index) an object under its current value
+        """
+        obj_id = obj.id
+        key = self.key(getattr(obj, self.attribute, None))
+        if obj_id in self._keys:
+            if self._keys[obj_id] == key:
+                return
+            self.discard(obj_id)
+        self._keys[obj_id] = key
+        # most keys hold one ID: keep it bare, and a set from the second
+        ids = self._ids.get(key)
+        if ids is None:
+            self._ids[key] = obj_id
+        elif type(ids) is set:
+            ids.add(obj_id)
+        else:
+            self._ids[key] = {ids, obj_id}
+
+    def discard(self, obj_id: str):
+        """ Remove an object from the index
+        """
+        if obj_id not in self._keys:
+            return
+        key = self._keys.pop(obj_id)
+        ids = self._ids.get(key)
+        if type(ids) is set:
+            ids.discard(obj_id)
+            if len(ids) == 1:
+                self._ids[key] = ids.pop()
+        elif ids is not None:
+            del self._ids[key]
+
+    def lookup(self, value: Any) -> Set[str]:
+        """ IDs of the objects indexed under `value`
+        """
+        ids = self._ids.get(self.key(value))
+        if ids is None:
+            return set()
+        if type(ids) is set:
+            return set(ids)
+        return {ids}
+
+
+class OrderedIndex():
+    """ Sorted (value, ID) entries of an attribute, for ordered scans
+    and keyset pagination
+    """
+
+    def __init__(self, attribute: str,
+                 parse: Callable[[str], datetime] = None):
+        """ Initialize an empty index on `attribute`, a timestamp if
+        `parse` is given: stored strings (lazily loaded records) are
+        parsed into the datetime objects instances hold
+        """
+        self.attribute = attribute
+        self.parse = parse
+        self.clear()
+
+    def clear(self):
+        """ Drop every entry of the index
+        """
+        self._entries = []
+        self._keys = {}
+
+    def build(self, objs: Iterable[Any]):
+        """ Index every object of `objs` into an empty index, sorting
+        once instead of inserting one by one
+        """
+        for obj in objs:
+            self._keys[obj.id] = self.key(
+                getattr(obj, self.attribute, None)) + (obj.id,)
+        self._entries = sorted(self._keys.values())
+
+    def key(self, value: Any) -> tuple:
+        """ Sort key of a value: None sorts first. Timestamps are keyed
+        by the datetime itself, which the object already holds; TypeError
+        for a string that is not a stored timestamp
+        """
+        if value is None:
+            return (0, None)
+        if self.parse is not None and type(value) is str:
+            try:
+                value = self.parse(value)
+            except ValueError:
+                raise TypeError("Not a timestamp: {}".format(value))
+        return (1, value)
+
+    def add(self, obj: Any):
+        """ Index (or re-index) an object under its current value
+        """
+        obj_id = obj.id
+        entry = self.key(getattr(obj, self.attribute, None)) + (obj_id,)
+        if obj_id in self._keys:
+            if self._keys[obj_id] == entry:
+                return
+            self.discard(obj_id)
+        self._keys[obj_id] = entry
+        bisect.insort(self._entries, entry)
+
+    def discard(self, obj_id: str):
+        """ Remove an object from the index
+        """
+        if obj_id not in self._keys:
+            return
+        entry = self._keys.pop(obj_id)
+        i = bisect.bisect_left(self._entries, entry)
+        if i < len(self._entries) and self._entries[i] == entry:
+            del self._entries[i]
+
+    def __len__(self) -> int:
+        """ Number of indexed objects
+        """
+        return len(self._entries)
+
+    def span(self, low: Any = None, high: Any = None,
+             low_inclusive: bool = True,
+             high_inclusive: bool = True) -> Tuple[int, int]:
+        """ Positions [start, end) of the entries whose value lies between
+        `low` and `high` (None: unbounded; None values are excluded).
+        TypeError if the bounds do not compare with the indexed values
+        """
+        entries = self._entries
+        if low is None:
+            start = bisect.bisect_left(entries, (1,))
+        elif low_inclusive:
+            start = bisect.bisect_left(entries, self.key(low))
+        else:
+            start = bisect.bisect_right(entries, self.key(low) + (TOP,))
+        if high is None:
+            end = len(entries)
+        elif high_inclusive:
+            end = bisect.bisect_right(entries, self.key(high) + (TOP,))
+        else:
+            end = bisect.bisect_left(entries, self.key(high))
+        return start, max(start, end)
+
+    def ids(self, start: int = 0, end: int = None,
+            reverse: bool = False) -> List[str]:
+        """ IDs of the entries [start, end), in index order
+        """
+        entries = self._entries[start:end]
+        if reverse:
+            entries.reverse()
+        return [e[-1] for e in entries]
+
+    def cursor(self, obj_id: str) -> str:
+        """ Opaque cursor pointing right after `obj_id`
+        """
+        return self.encode_cursor(self._keys[obj_id][:2], obj_id)
+
+    @staticmethod
+    def encode_cursor(key: tuple, obj_id: str) -> str:
+        """ Opaque cursor pointing right after the entry (key, obj_id)
+        """
+        flag, value = key
+        if type(value) is datetime:
+            value = value.isoformat()
+        position = json.dumps([flag, value, obj_id]).encode('utf-8')
+        return base64.urlsafe_b64encode(position).decode('ascii')
+
+    @staticmethod
+    def position(cursor: str) -> tuple:
+        """ Entry a cursor points after; ValueError if malformed
+        """
+        try:
+            flag, value, obj_id = json.loads(
+                base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except Exception:
+            raise ValueError("Invalid cursor")
+        if type(flag) is not int or type(obj_id) is not str or \
+                flag == 0 and value is not None or \
+                flag == 1 and type(value) not in (str, int, float) or \
+                flag not in (0, 1):
+            raise ValueError("Invalid cursor")
+        return (flag, value, obj_id)
+
+    def _position(self, cursor: str) -> tuple:
+        """ position() of a cursor whose value compares with the indexed
+        ones; ValueError otherwise
+        """
+        entry = self.position(cursor)
+        if self.parse is not None and type(entry[1]) is str:
+            entry = (entry[0], datetime.fromisoformat(entry[1]), entry[2])
+        i = bisect.bisect_left(self._entries, (1,))
+        if entry[0] == 1 and i < len(self._entries):
+            sample = self._entries[i][1]
+            if type(entry[1]) is not type(sample) and not (
+                    type(entry[1]) in (int, float) and
+                    type(sample) in (int, float)):
+                raise ValueError("Invalid cursor")
+        return entry
+
+    def page(self, cursor: str = None, limit: int = None,
+             reverse: bool = False) -> Tuple[List[str], str]:
+        """ IDs of the next page after `cursor` and the cursor of the
+        page that follows (None after the last page)
+        """
+        entries = self._entries
+        if reverse:
+            end = len(entries)
+            if cursor is not None:
+                end = bisect.bisect_left(entries, self._position(cursor))
+            start = 0 if limit is None else max(0, end - limit)
+            page = entries[start:end]
+            page.reverse()
+            more = start > 0
+        else:
+            start = 0
+            if cursor is not None:
+                start = bisect.bisect_right(entries,
+                                            self._position(cursor))
+            end = len(entries) if limit is None else start + limit
+            page = entries[start:end]
+            more = end < len(entries)
+        ids = [e[-1] for e in page]
+        if more and len(page) > 0:
+            return ids, self.encode_cursor(page[-1][:2], page[-1][-1])
+        return ids, None
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+""" JSON stream module: incremental parsing of a top-level JSON object
+"""
+import codecs
+import json
+import re
+from typing import Any, Iterator, Tuple
+
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+CHUNK_SIZE = 1 << 20
+
+
+class JSONObjectStream():
+    """ Yield the (key, value) pairs of a top-level JSON object one by one
+    from a text file, a binary file or a memory-mapped buffer, so only one
+    value is decoded in memory at a time
+    """
+
+    def __init__(self, source: Any, chunk_size: int = CHUNK_SIZE):
+        """ Initialize the stream over anything with a read(size) method
+        """
+        self._source = source
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _more(self):
+        """ Read the next chunk, dropping what was already consumed
+        """
+        chunk = self._source.read(self._chunk_size)
+        if type(chunk) is not str:
+            chunk = self._utf8.decode(chunk, final=len(chunk) == 0)
+        if len(chunk) == 0:
+            self._eof = True
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+
+    def _peek(self) -> str:
+        """ Skip whitespace and return the next character ('' at EOF)
+        """
+        while True:
+            if self._pos < len(self._buf):
+                char = self._buf[self._pos]
+                if char not in ' \t\n\r':
+                    return char
+            self._pos = WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if self._eof:
+                return ""
+            self._more()
+
+    def _expect(self, char: str):
+        """ Consume `char` or fail
+        """
+        if self._peek() != char:
+            raise ValueError("Expecting '{}' at offset {}".format(
+                char, self._pos))
+        self._pos += 1
+
+    def _value(self) -> Any:
+        """ Decode the next JSON value, reading more input when needed
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                if self._eof:
+                    raise
+                self._more()
+                continue
+            # a number may continue in the next chunk
+            if end == len(self._buf) and not self._eof:
+                self._more()
+                continue
+            self._pos = end
+            return value
+
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        """ Iterate over the members of the object
+        """
+        if self._peek() == "":
+            return
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            yield key, self._value()
+            if self._peek() == '}':
+                return
+            self._expect(',')
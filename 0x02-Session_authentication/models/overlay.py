@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+""" Overlay module: objects of a class in a forked worker, and the memory
+of the processes sharing them
+"""
+from typing import Any, Iterator, List
+
+
+class Overlay():
+    """ Mapping ID -> object made of the snapshot loaded by the pre-fork
+    master (`base`, shared with the other workers and never written) and
+    of the changes of this worker: `changes` holds the objects it saved,
+    `hidden` the IDs of `base` it saved or removed, `hydrated` the
+    instances it built from records of `base` (returned in their place,
+    so that every read of an ID gets the same instance).
+
+    Like DATA dicts for readers, keys()/values()/items() return lists
+    """
+    __slots__ = ('base', 'changes', 'hidden', 'hydrated')
+
+    def __init__(self, base: dict):
+        """ Initialize an overlay without changes over `base`
+        """
+        self.base = base
+        self.changes = {}
+        self.hidden = set()
+        self.hydrated = {}
+
+    def __len__(self) -> int:
+        """ Number of objects
+        """
+        return len(self.base) - len(self.hidden) + len(self.changes)
+
+    def __contains__(self, obj_id: str) -> bool:
+        """ True if an object has this ID
+        """
+        return obj_id in self.changes or \
+            (obj_id in self.base and obj_id not in self.hidden)
+
+    def get(self, obj_id: str, default: Any = None) -> Any:
+        """ Object of an ID, or `default`
+        """
+        obj = self.changes.get(obj_id)
+        if obj is not None:
+            return obj
+        if obj_id in self.hidden:
+            return default
+        obj = self.hydrated.get(obj_id)
+        if obj is not None:
+            return obj
+        return self.base.get(obj_id, default)
+
+    def __getitem__(self, obj_id: str) -> Any:
+        """ Object of an ID (KeyError if none)
+        """
+        obj = self.get(obj_id)
+        if obj is None:
+            raise KeyError(obj_id)
+        return obj
+
+    def __setitem__(self, obj_id: str, obj: Any):
+        """ Set the object of an ID, in the changes of this worker
+        """
+        if obj_id in self.base:
+            self.hidden.add(obj_id)
+            self.hydrated.pop(obj_id, None)
+        self.changes[obj_id] = obj
+
+    def __delitem__(self, obj_id: str):
+        """ Remove the object of an ID (KeyError if none)
+        """
+        if obj_id in self.changes:
+            del self.changes[obj_id]
+        elif obj_id in self.base and obj_id not in self.hidden:
+            self.hidden.add(obj_id)
+            self.hydrated.pop(obj_id, None)
+        else:
+            raise KeyError(obj_id)
+
+    def pop(self, obj_id: str, *default: Any) -> Any:
+        """ Remove and return the object of an ID
+        """
+        obj = self.get(obj_id)
+        if obj is None:
+            if default:
+                return default[0]
+            raise KeyError(obj_id)
+        del self[obj_id]
+        return obj
+
+    def setdefault(self, obj_id: str, default: Any = None) -> Any:
+        """ Object of an ID, set to `default` if there is none
+        """
+        obj = self.get(obj_id)
+        if obj is None:
+            self[obj_id] = obj = default
+        return obj
+
+    def __iter__(self) -> Iterator[str]:
+        """ IDs of the objects
+        """
+        return iter(self.keys())
+
+    def keys(self) -> List[str]:
+        """ IDs of the objects
+        """
+        hidden = self.hidden
+        return [k for k in self.base if k not in hidden] + \
+            list(self.changes)
+
+    def values(self) -> List[Any]:
+        """ Objects
+        """
+        hidden, hydrated = self.hidden, self.hydrated
+        if not hidden and not hydrated:
+            return list(self.base.values()) + list(self.changes.values())
+        return [hydrated.get(k, v) for k, v in self.base.items()
+                if k not in hidden] + list(self.changes.values())
+
+    def items(self) -> List[tuple]:
+        """ (ID, object) pairs
+        """
+        hidden, hydrated = self.hidden, self.hydrated
+        return [(k, hydrated.get(k, v)) for k, v in self.base.items()
+                if k not in hidden] + list(self.changes.items())
+
+
+def memory_usage(pid: str = "self") -> dict:
+    """ Memory of a process in kB (Linux): 'rss', 'pss' (shared pages
+    divided among the processes sharing them) and 'private' (pages
+    nobody else maps, e.g. copied on write)
+    """
+    usage = {'rss': 0, 'pss': 0, 'private': 0}
+    fields = {'Rss:': 'rss', 'Pss:': 'pss',
+              'Private_Clean:': 'private', 'Private_Dirty:': 'private'}
+    with open("/proc/{}/smaps_rollup".format(pid)) as f:
+        for line in f:
+            parts = line.split()
+            if parts and parts[0] in fields:
+                usage[fields[parts[0]]] += int(parts[1])
+    return usage
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+""" Query module: chainable predicates over the objects of a Base class,
+served from the cheapest index available
+"""
+from typing import (Any, Callable, Iterable, Iterator, List, Tuple,
+                    TypeVar)
+from models.index import prefix_bounds
+import itertools
+import models.base as base
+
+
+OPERATORS = ('eq', 'in', 'prefix', 'lt', 'le', 'gt', 'ge')
+RANGES = {
+    'lt': ('high', False),
+    'le': ('high', True),
+    'gt': ('low', False),
+    'ge': ('low', True),
+}
+
+
+def matches(predicate: tuple, value: Any,
+            normalize: Callable[[Any], Any] = base.comparable) -> bool:
+    """ True if `value` satisfies (op, attribute, operand), eq and in
+    comparing values as `normalize` returns them
+    """
+    op, attribute, operand = predicate
+    if op == 'eq':
+        return normalize(value) == normalize(operand)
+    if op == 'in':
+        value = normalize(value)
+        return any(value == normalize(v) for v in operand)
+    value = base.comparable(value)
+    if op == 'prefix':
+        return type(value) is str and value.startswith(operand)
+    if value is None:
+        return False
+    operand = base.comparable(operand)
+    try:
+        if op == 'lt':
+            return value < operand
+        if op == 'le':
+            return value <= operand
+        if op == 'gt':
+            return value > operand
+        return value >= operand
+    except TypeError:
+        return False
+
+
+class Query():
+    """ Objects of `cls` matching every predicate, e.g.
+    User.query().prefix('email', 'bob').gt('created_at', day).first()
+
+    Results are produced lazily: first() and limit() stop reading once
+    enough objects matched
+    """
+
+    def __init__(self, cls: Any):
+        """ Initialize a query matching every object of `cls`
+        """
+        self.cls = cls
+        self.predicates = []
+        self._limit = None
+
+    def _add(self, op: str, attribute: str, operand: Any) -> 'Query':
+        """ Add one predicate; AttributeError if objects of the class
+        cannot have `attribute`
+        """
+        if op not in OPERATORS:
+            raise ValueError("Unknown operator: {}".format(op))
+        if not self.cls.__dictoffset__ and not hasattr(self.cls, attribute):
+            # not a slot nor a property: no object can have it
+            raise AttributeError("'{}' object has no attribute '{}'"
+                                 .format(self.cls.__name__, attribute))
+        if op == 'in':
+            operand = list(operand)
+        elif op == 'prefix' and type(operand) is not str:
+            raise TypeError("prefix must be a string")
+        self.predicates.append((op, attribute, operand))
+        return self
+
+    def eq(self, attribute: str, value: Any) -> 'Query':
+        """ attribute == value
+        """
+        return self._add('eq', attribute, value)
+
+    def in_(self, attribute: str, values: Iterable[Any]) -> 'Query':
+        """ attribute is one of `values`
+        """
+        return self._add('in', attribute, values)
+
+    def prefix(self, attribute: str, prefix: str) -> 'Query':
+        """ attribute is a string starting with `prefix`
+        """
+        return self._add('prefix', attribute, prefix)
+
+    def lt(self, attribute: str, value: Any) -> 'Query':
+        """ attribute < value
+        """
+        return self._add('lt', attribute, value)
+
+    def le(self, attribute: str, value: Any) -> 'Query':
+        """ attribute <= value
+        """
+        return self._add('le', attribute, value)
+
+    def gt(self, attribute: str, value: Any) -> 'Query':
+        """ attribute > value
+        """
+        return self._add('gt', attribute, value)
+
+    def ge(self, attribute: str, value: Any) -> 'Query':
+        """ attribute >= value
+        """
+        return self._add('ge', attribute, value)
+
+    def where(self, attributes: dict) -> 'Query':
+        """ attribute == value for every item of `attributes`
+        """
+        for k, v in attributes.items():
+            self.eq(k, v)
+        return self
+
+    def limit(self, limit: int) -> 'Query':
+        """ Stop after `limit` objects
+        """
+        if limit is not None and limit < 0:
+            raise ValueError("limit must be positive")
+        self._limit = limit
+        return self
+
+    def _match(self, obj: Any, checks: List[tuple]) -> Any:
+        """ The object (hydrated) if it matches every (predicate,
+        normalizer) of `checks`, else None
+        """
+        if type(obj) is base.RawRecord:
+            # compare stored values, without building the instance
+            # unless a predicate is not on a stored field
+            if all(obj.has(p[1]) for p in self.predicates):
+                for predicate, normalize in checks:
+                    if not matches(predicate, obj.get(predicate[1]),
+                                   normalize):
+                        return None
+                return self.cls._hydrate(obj)
+            obj = self.cls._hydrate(obj)
+        for predicate, normalize in checks:
+            if not matches(predicate, getattr(obj, predicate[1], None),
+                           normalize):
+                return None
+        return obj
+
+    def _ordered_ids(self, index: Any, op: str,
+                     operand: Any) -> Tuple[int, int]:
+        """ Span of the ordered index matching one predicate
+        """
+        if op == 'eq':
+            if operand is None:
+                return 0, index.span(high=None)[0]
+            return index.span(operand, operand)
+        if op == 'prefix':
+            low, high = prefix_bounds(operand)
+            return index.span(low, high, high_inclusive=False)
+        bound, inclusive = RANGES[op]
+        if bound == 'low':
+            return index.span(low=operand, low_inclusive=inclusive)
+        return index.span(high=operand, high_inclusive=inclusive)
+
+    def plan(self) -> dict:
+        """ Cheapest access path: {'plan': 'index' (hash lookup), 'range'
+        (ordered index span) or 'scan', 'attribute', 'rows' (estimated
+        number of candidates), 'ids' (None for a scan)}
+        """
+        s_class = self.cls.__name__
+        best = {'plan': 'scan', 'attribute': None,
+                'rows': len(base.DATA.get(s_class, {})), 'ids': None}
+        if len(self.predicates) == 0:
+            return best
+        indexes = self.cls._indexes()
+        spans = {}
+        for op, attribute, operand in self.predicates:
+            index = indexes['hash'].get(attribute)
+            if index is not None and op in ('eq', 'in'):
+                values = [operand] if op == 'eq' else operand
+                try:
+                    ids = set()
+                    for value in values:
+                        ids |= index.lookup(value)
+                except TypeError:
+                    ids = None
+                if ids is not None and len(ids) < best['rows']:
+                    best = {'plan': 'index', 'attribute': attribute,
+                            'rows': len(ids), 'ids': ids}
+                continue
+            if op == 'in':
+                continue
+            index = self.cls.ordered_index(attribute)
+            if index is None:
+                continue
+            try:
+                start, end = self._ordered_ids(index, op, operand)
+            except TypeError:
+                continue
+            if attribute in spans:
+                # several bounds on the same attribute: intersect
+                start = max(start, spans[attribute][0])
+                end = min(end, spans[attribute][1])
+            spans[attribute] = (start, max(start, end))
+        for attribute, (start, end) in spans.items():
+            if end - start < best['rows']:
+                best = {'plan': 'range', 'attribute': attribute,
+                        'rows': end - start,
+                        'ids': self.cls.ordered_index(attribute).ids(
+                            start, end)}
+        return best
+
+    def __iter__(self) -> Iterator[TypeVar('Base')]:
+        """ Matching objects, read lazily
+        """
+        if base.STORAGE is not None:
+            yield from base.STORAGE.query(self.cls, self.predicates,
+                                          self._limit)
+            return
+        if self._limit == 0:
+            return
+        objs = base.DATA[self.cls.__name__]
+        plan = self.plan()
+        if plan['ids'] is None:
+            candidates = list(objs.values())
+        else:
+            candidates = filter(None, (objs.get(i) for i in
+                                       list(plan['ids'])))
+        checks = [(p, self.cls.normalizer(p[1])) for p in self.predicates]
+        found = 0
+        for candidate in candidates:
+            obj = self._match(candidate, checks)
+            if obj is None:
+                continue
+            yield obj
+            found += 1
+            if found == self._limit:
+                return
+
+    def all(self) -> List[TypeVar('Base')]:
+        """ Every matching object
+        """
+        return list(self)
+
+    def first(self) -> TypeVar('Base'):
+        """ First matching object, or None
+        """
+        return next(itertools.islice(self, 1), None)
+
+    def explain(self) -> dict:
+        """ How the query would run, without running it
+        """
+        result = {
+            'filters': [list(p) for p in self.predicates],
+            'limit': self._limit,
+        }
+        if base.STORAGE is not None:
+            result.update(base.STORAGE.explain(self.cls, self.predicates,
+                                               self._limit))
+            return result
+        plan = self.plan()
+        result.update({
+            'storage': 'memory',
+            'plan': plan['plan'],
+            'attribute': plan['attribute'],
+            'estimated_rows': plan['rows'],
+        })
+        return result
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+""" Serializers module: snapshot file formats of models.base.Base
+"""
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Iterator, Tuple
+from models.json_stream import JSONObjectStream
+import json
+import struct
+
+
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+
+
+class JSONSerializer():
+    """ Human readable snapshot: {"<id>": {<to_json(True)>}, ...}
+    """
+    name = "json"
+    extension = "json"
+
+    def detect(self, head: bytes) -> bool:
+        """ JSON is the fallback format
+        """
+        return True
+
+    def dump(self, objs: Iterable[Any], f: Any):
+        """ Write objects to a binary file, one member at a time
+        """
+        chunk = {}
+        separator = b""
+        f.write(b"{")
+        for obj in objs:
+            chunk[obj.id] = obj.to_json(True)
+            if len(chunk) == 1024:
+                # one encoder call per chunk: members without the braces
+                f.write(separator + json.dumps(chunk)[1:-1].encode('utf-8'))
+                separator = b", "
+                chunk = {}
+        if chunk:
+            f.write(separator + json.dumps(chunk)[1:-1].encode('utf-8'))
+        f.write(b"}")
+
+    def load(self, buf: Any) -> Iterator[Tuple[str, dict]]:
+        """ Yield (id, constructor kwargs) of every stored object
+        """
+        return iter(JSONObjectStream(buf))
+
+
+class BinarySerializer():
+    """ Compact snapshot with typed fields:
+
+    header:  magic, version (u16), field count (u16)
+    fields:  type (u8: s=string, t=timestamp, j=JSON), name length (u16),
+             UTF-8 name
+    records: one fixed-size struct per record holding every string length
+             (u32, 0xFFFFFFFF for None) and timestamp (i64 epoch seconds,
+             INT64_MIN for None) in field order, followed by the UTF-8
+             bytes of the strings
+    """
+    name = "binary"
+    extension = "bin"
+    MAGIC = b"\x89MDB"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHH")
+    FIELD = struct.Struct("<BH")
+    NONE_LENGTH = 0xFFFFFFFF
+    NONE_EPOCH = -(1 << 63)
+
+    def detect(self, head: bytes) -> bool:
+        """ Binary snapshots start with MAGIC
+        """
+        return bytes(head[:len(self.MAGIC)]) == self.MAGIC
+
+    @staticmethod
+    def _type(value: Any) -> str:
+        """ Field type able to hold `value` ('n' for None)
+        """
+        if value is None:
+            return 'n'
+        if type(value) is str:
+            return 's'
+        if type(value) is datetime:
+            return 't'
+        return 'j'
+
+    def dump(self, objs: Iterable[Any], f: Any):
+        """ Write objects (iterated twice: schema, then records)
+        """
+        types = {}
+        for obj in objs:
+            for name, value in obj.attributes():
+                found, known = self._type(value), types.get(name, 'n')
+                if known == 'n':
+                    types[name] = found
+                elif found != 'n' and found != known:
+                    types[name] = 'j'
+        names = list(types)
+        types = [types[n] if types[n] != 'n' else 's' for n in names]
+        record = struct.Struct("<" + "".join(
+            'q' if t == 't' else 'I' for t in types))
+
+        f.write(self.HEADER.pack(self.MAGIC, self.VERSION, len(names)))
+        for name, field_type in zip(names, types):
+            encoded = name.encode('utf-8')
+            f.write(self.FIELD.pack(ord(field_type), len(encoded)))
+            f.write(encoded)
+
+        chunks = []
+        for obj in objs:
+            values = dict(obj.attributes())
+            numbers = []
+            strings = []
+            for name, field_type in zip(names, types):
+                value = values.get(name)
+                if field_type == 't':
+                    numbers.append(self.NONE_EPOCH if value is None
+                                   else (value - EPOCH) // ONE_SECOND)
+                    continue
+                if field_type == 'j' and value is not None:
+                    value = json.dumps(value)
+                if value is None:
+                    numbers.append(self.NONE_LENGTH)
+                    continue
+                encoded = value.encode('utf-8')
+                numbers.append(len(encoded))
+                strings.append(encoded)
+            chunks.append(record.pack(*numbers))
+            chunks.extend(strings)
+            if len(chunks) >= 8192:
+                f.write(b"".join(chunks))
+                chunks = []
+        f.write(b"".join(chunks))
+
+    def load(self, buf: Any) -> Iterator[Tuple[str, dict]]:
+        """ Yield (id, constructor kwargs) of every stored object;
+        timestamps are decoded to datetime objects
+        """
+        magic, version, count = self.HEADER.unpack_from(buf, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError("Unsupported snapshot version {}".format(version))
+        offset = self.HEADER.size
+        fields = []
+        for _ in range(count):
+            field_type, length = self.FIELD.unpack_from(buf, offset)
+            offset += self.FIELD.size
+            name = str(buf[offset:offset + length], 'utf-8')
+            offset += length
+            fields.append((name, chr(field_type)))
+        record = struct.Struct("<" + "".join(
+            'q' if t == 't' else 'I' for _, t in fields))
+
+        timestamps = {}
+        size = len(buf)
+        none_epoch, none_length = self.NONE_EPOCH, self.NONE_LENGTH
+        unpack_from, record_size = record.unpack_from, record.size
+        while offset < size:
+            numbers = unpack_from(buf, offset)
+            offset += record_size
+            kwargs = {}
+            for (name, field_type), number in zip(fields, numbers):
+                if field_type == 't':
+                    if number == none_epoch:
+                        kwargs[name] = None
+                        continue
+                    value = timestamps.get(number)
+                    if value is None:
+                        value = EPOCH + timedelta(seconds=number)
+                        timestamps[number] = value
+                    kwargs[name] = value
+                elif number == none_length:
+                    kwargs[name] = None
+                else:
+                    value = buf[offset:offset + number].decode('utf-8')
+                    offset += number
+                    if field_type == 'j':
+                        value = json.loads(value)
+                    kwargs[name] = value
+            yield kwargs.get('id'), kwargs
+
+
+SERIALIZERS = {
+    JSONSerializer.name: JSONSerializer(),
+    BinarySerializer.name: BinarySerializer(),
+}
+
+
+def detect(head: bytes) -> Any:
+    """ Serializer able to read a file starting with `head`
+    """
+    for serializer in (SERIALIZERS['binary'], SERIALIZERS['json']):
+        if serializer.detect(head):
+            return serializer
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+""" SQLite storage module: engine used by models.base.Base when
+MODEL_STORAGE=sqlite
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from os import path
+from typing import Any, Iterator, List, Tuple
+from models.index import OrderedIndex, prefix_bounds
+from models.serializers import detect
+import json
+import mmap
+import sqlite3
+import threading
+
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+class SQLiteStorage():
+    """ One table per class: (id TEXT PRIMARY KEY, data TEXT) where data
+    is to_json(True). Attributes get an expression index the first time
+    they are searched or sorted on
+    """
+
+    def __init__(self, db_path: str):
+        """ Initialize the engine on the SQLite file `db_path`
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._tables = set()
+        self._indexed = set()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """ Connection of the current thread
+        """
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, isolation_level=None,
+                                 timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+            self._local.depth = 0
+        return db
+
+    @staticmethod
+    def _column(attribute: str) -> str:
+        """ SQL expression of an attribute
+        """
+        if not attribute.isidentifier():
+            raise ValueError("Invalid attribute: {}".format(attribute))
+        return "json_extract(data, '$.{}')".format(attribute)
+
+    @staticmethod
+    def _value(value: Any) -> Any:
+        """ Value as stored in the JSON document
+        """
+        if type(value) is datetime:
+            return value.strftime(TIMESTAMP_FORMAT)
+        return value
+
+    def table(self, cls: Any) -> str:
+        """ Quoted table name of a class, created if needed
+        """
+        table = '"{}"'.format(cls.__name__)
+        if table not in self._tables:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS {} "
+                "(id TEXT PRIMARY KEY, data TEXT NOT NULL)".format(table))
+            self._tables.add(table)
+        return table
+
+    def index(self, cls: Any, attribute: str, folded: bool = False) -> str:
+        """ SQL expression of an attribute (lowercased if `folded`),
+        indexed
+        """
+        column = self._column(attribute)
+        name = "{}_{}".format(cls.__name__, attribute)
+        if folded:
+            column = "lower({})".format(column)
+            name += "_folded"
+        if name not in self._indexed:
+            self.db.execute('CREATE INDEX IF NOT EXISTS "ix_{}" ON {}({})'
+                            .format(name, self.table(cls), column))
+            self._indexed.add(name)
+        return column
+
+    @contextmanager
+    def transaction(self):
+        """ Run the block in one transaction (rolled back if it raises)
+        """
+        db = self.db
+        if self._local.depth == 0:
+            db.execute("BEGIN")
+        self._local.depth += 1
+        try:
+            yield
+        except BaseException:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                db.execute("ROLLBACK")
+            raise
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            db.execute("COMMIT")
+
+    def _objects(self, cls: Any, rows: Iterator[tuple]) -> List[Any]:
+        """ Instances built from (data,) rows
+        """
+        return [cls(**json.loads(row[0])) for row in rows]
+
+    def save(self, obj: Any):
+        """ Insert or replace one object
+        """
+        self.db.execute("INSERT OR REPLACE INTO {} (id, data) VALUES (?, ?)"
+                        .format(self.table(obj.__class__)),
+                        (obj.id, json.dumps(obj.to_json(True))))
+
+    def remove(self, obj: Any):
+        """ Delete one object
+        """
+        self.db.execute("DELETE FROM {} WHERE id = ?".format(
+            self.table(obj.__class__)), (obj.id,))
+
+    def get(self, cls: Any, obj_id: str) -> Any:
+        """ One object by ID, or None
+        """
+        objs = self._objects(cls, self.db.execute(
+            "SELECT data FROM {} WHERE id = ?".format(self.table(cls)),
+            (obj_id,)))
+        return objs[0] if objs else None
+
+    def count(self, cls: Any) -> int:
+        """ Number of stored objects
+        """
+        return self.db.execute("SELECT COUNT(*) FROM {}".format(
+            self.table(cls))).fetchone()[0]
+
+    def _where(self, cls: Any, predicates: List[tuple]
+               ) -> Tuple[str, list]:
+        """ WHERE clause (empty if no predicate) and its parameters for
+        (op, attribute, operand) predicates of models.query.Query
+        """
+        clauses = []
+        params = []
+        for op, attribute, operand in predicates:
+            # case-insensitive attributes compare lowercased (SQLite
+            # lower() folds ASCII letters only)
+            folded = op in ('eq', 'in') and \
+                cls.case_insensitive(attribute) is not None
+            column = self.index(cls, attribute, folded)
+            if folded:
+                operand = [v.lower() if type(v) is str else v
+                           for v in (operand if op == 'in' else [operand])]
+                if op == 'eq':
+                    operand = operand[0]
+            if op == 'eq' and operand is None:
+                clauses.append("{} IS NULL".format(column))
+            elif op == 'in':
+                values = [self._value(v) for v in operand if v is not None]
+                clause = "{} IN ({})".format(
+                    column, ", ".join("?" * len(values)))
+                if len(values) < len(operand):
+                    clause = "({} OR {} IS NULL)".format(clause, column)
+                clauses.append(clause)
+                params.extend(values)
+            elif op == 'prefix':
+                # a range on the index: strings in [prefix, prefix+1)
+                if len(operand) == 0:
+                    clauses.append("typeof({}) = 'text'".format(column))
+                    continue
+                low, high = prefix_bounds(operand)
+                if high is None:
+                    # no upper bound: check the prefix itself
+                    clauses.append("{c} >= ? AND substr({c}, 1, ?) = ?"
+                                   .format(c=column))
+                    params.extend([low, len(low), low])
+                    continue
+                clauses.append("{c} >= ? AND {c} < ?".format(c=column))
+                params.extend([low, high])
+            else:
+                sign = {'eq': '=', 'lt': '<', 'le': '<=', 'gt': '>',
+                        'ge': '>='}[op]
+                value = self._value(operand)
+                clause = "{} {} ?".format(column, sign)
+                if op != 'eq':
+                    # SQLite orders numbers before strings where Python
+                    # refuses to compare them: keep values of the same type
+                    clause += " AND typeof({}) {}".format(
+                        column, "= 'text'" if type(value) is str
+                        else "IN ('integer', 'real')")
+                clauses.append(clause)
+                params.append(value)
+        if not clauses:
+            return "", params
+        return " WHERE " + " AND ".join(clauses), params
+
+    def _select(self, cls: Any, predicates: List[tuple],
+                limit: int = None) -> Tuple[str, list]:
+        """ SELECT statement of a query and its parameters
+        """
+        where, params = self._where(cls, predicates)
+        sql = "SELECT data FROM {}{}".format(self.table(cls), where)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return sql, params
+
+    def query(self, cls: Any, predicates: List[tuple],
+              limit: int = None) -> Iterator[Any]:
+        """ Objects matching every predicate, read lazily
+        """
+        sql, params = self._select(cls, predicates, limit)
+        for row in self.db.execute(sql, params):
+            yield cls(**json.loads(row[0]))
+
+    def explain(self, cls: Any, predicates: List[tuple],
+                limit: int = None) -> dict:
+        """ Plan SQLite picked for a query
+        """
+        sql, params = self._select(cls, predicates, limit)
+        details = [row[-1] for row in self.db.execute(
+            "EXPLAIN QUERY PLAN " + sql, params)]
+        return {
+            'storage': 'sqlite',
+            'plan': 'index' if any('INDEX' in d for d in details)
+            else 'scan',
+            'sql': sql,
+            'details': details,
+        }
+
+    def page(self, cls: Any, sort: str, cursor: str = None,
+             limit: int = None, reverse: bool = False
+             ) -> Tuple[List[Any], str]:
+        """ Objects ordered by (sort, id) after `cursor`, and the cursor
+        of the next page (None on the last one)
+        """
+        column = self.index(cls, sort)
+        order = "DESC" if reverse else "ASC"
+        sql = "SELECT data, {} FROM {}".format(column, self.table(cls))
+        params = []
+        if cursor is not None:
+            flag, value, obj_id = OrderedIndex.position(cursor)
+            value = self._value(value)
+            after = "<" if reverse else ">"
+            if flag == 0:
+                # NULLs sort first: compare IDs among NULLs only
+                clause = "({c} IS NULL AND id {a} ?)"
+                if not reverse:
+                    clause += " OR {c} IS NOT NULL"
+                params.append(obj_id)
+            else:
+                clause = "({c}, id) {a} (?, ?)"
+                if reverse:
+                    clause += " OR {c} IS NULL"
+                params.extend([value, obj_id])
+            sql += " WHERE " + clause.format(c=column, a=after)
+        sql += " ORDER BY {c} {o}, id {o}".format(c=column, o=order)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+        rows = self.db.execute(sql, params).fetchall()
+        more = limit is not None and len(rows) > limit
+        rows = rows[:limit]
+        objs = self._objects(cls, rows)
+        if not more:
+            return objs, None
+        last = rows[-1][1]
+        key = (0, None) if last is None else (1, last)
+        return objs, OrderedIndex.encode_cursor(key, objs[-1].id)
+
+    def load(self, cls: Any):
+        """ Create the table; an empty table imports the existing
+        .db_<Class>.json (or .bin) snapshot, then the changes of
+        .db_<Class>.journal, as Base.load_from_file() reads them
+        """
+        self.table(cls)
+        if self.count(cls) > 0:
+            return
+        file_path = cls.snapshot_path()
+        with self.transaction():
+            if file_path is not None and path.getsize(file_path) > 0:
+                with open(file_path, 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0,
+                                  access=mmap.ACCESS_READ) as m:
+                    for obj_id, obj_json in detect(m[:8]).load(m):
+                        self.save(cls(**obj_json))
+            if path.exists(cls.journal_path()):
+                with open(cls.journal_path(), 'rb') as f:
+                    self._replay(cls, f)
+
+    def _replay(self, cls: Any, f: Any):
+        """ Apply the journal records read from `f`
+        """
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # torn write at the end of the journal
+                break
+            if record.get('op') == 'save':
+                self.save(cls(**record['obj']))
+            elif record.get('op') == 'remove':
+                self.db.execute("DELETE FROM {} WHERE id = ?".format(
+                    self.table(cls)), (record.get('id'),))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+""" Stats module: counters maintained like the indexes of a class, on
+every save/remove, so that reading them never scans the objects
+"""
+from datetime import datetime
+from typing import Any, Callable, Iterable
+import sys
+
+
+def by_day(attribute: str) -> Callable[[Any], Any]:
+    """ Bucket of an object: day (YYYY-MM-DD) of a timestamp attribute
+    """
+    def bucket(obj: Any) -> Any:
+        value = getattr(obj, attribute, None)
+        # one string per day, shared by the objects of that day
+        if type(value) is datetime:
+            return sys.intern(value.date().isoformat())
+        if type(value) is str:
+            # stored form of a lazily loaded record
+            return sys.intern(value[:10])
+        return None
+    return bucket
+
+
+def is_set(*attributes: str) -> Callable[[Any], Any]:
+    """ Bucket of an object: "set" if one of `attributes` is not empty,
+    "unset" otherwise
+    """
+    def bucket(obj: Any) -> Any:
+        for attribute in attributes:
+            if getattr(obj, attribute, None) not in (None, ""):
+                return "set"
+        return "unset"
+    return bucket
+
+
+def value_of(attribute: str) -> Callable[[Any], Any]:
+    """ Bucket of an object: value of `attribute`
+    """
+    def bucket(obj: Any) -> Any:
+        return getattr(obj, attribute, None)
+    return bucket
+
+
+class Histogram():
+    """ Number of objects per bucket, where `bucket(obj)` maps an object to
+    its bucket (objects in bucket None are not counted)
+    """
+
+    def __init__(self, name: str, bucket: Callable[[Any], Any]):
+        """ Initialize an empty histogram
+        """
+        self.name = name
+        self.bucket = bucket
+        self.clear()
+
+    def clear(self):
+        """ Drop every count
+        """
+        self._counts = {}
+        self._buckets = {}
+
+    def build(self, objs: Iterable[Any]):
+        """ Count every object of `objs` into an empty histogram
+        """
+        for obj in objs:
+            self.add(obj)
+
+    def add(self, obj: Any):
+        """ Count (or move) an object into its current bucket
+        """
+        obj_id = obj.id
+        bucket = self.bucket(obj)
+        if obj_id in self._buckets:
+            if self._buckets[obj_id] == bucket:
+                return
+            self.discard(obj_id)
+        if bucket is None:
+            return
+        self._buckets[obj_id] = bucket
+        self._counts[bucket] = self._counts.get(bucket, 0) + 1
+
+    def discard(self, obj_id: str):
+        """ Uncount an object
+        """
+        bucket = self._buckets.pop(obj_id, None)
+        if bucket is None:
+            return
+        count = self._counts[bucket] - 1
+        if count == 0:
+            del self._counts[bucket]
+        else:
+            self._counts[bucket] = count
+
+    def summary(self) -> dict:
+        """ Count of each bucket
+        """
+        return {str(k): v for k, v in dict(self._counts).items()}
+
+
+class Cardinality(Histogram):
+    """ Number of distinct values of an attribute
+    """
+
+    def __init__(self, name: str, attribute: str):
+        """ Initialize an empty counter of the values of `attribute`
+        """
+        super().__init__(name, value_of(attribute))
+
+    def summary(self) -> int:
+        """ Number of distinct values
+        """
+        return len(self._counts)
@@ -2,12 +2,25 @@
 """ User module
 """
 import hashlib
+import sys
+from models import hashing
 from models.base import Base
+from models.stats import Cardinality, Histogram, by_day, is_set
 
 
 class User(Base):
     """ User class
     """
+    __slots__ = ('email', '_password', 'first_name', 'last_name',
+                 '_session_generation')
+    __indexes__ = ('email',)
+    __ordered_indexes__ = ('created_at', 'updated_at', 'email')
+    __optional__ = ('_session_generation',)
+    __stats__ = (
+        Histogram('created_per_day', by_day('created_at')),
+        Histogram('names', is_set('first_name', 'last_name')),
+        Cardinality('distinct_first_names', 'first_name'),
+    )
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
@@ -17,6 +30,14 @@ class User(Base):
         self._password = kwargs.get('_password')
         self.first_name = kwargs.get('first_name')
         self.last_name = kwargs.get('last_name')
+        if kwargs.get('_session_generation') is not None:
+            # set by revoke_sessions() only: unset users store nothing
+            self._session_generation = kwargs['_session_generation']
+        # names repeat a lot across users: keep one copy of each
+        if type(self.first_name) is str:
+            self.first_name = sys.intern(self.first_name)
+        if type(self.last_name) is str:
+            self.last_name = sys.intern(self.last_name)
 
     @property
     def password(self) -> str:
@@ -26,12 +47,19 @@ class User(Base):
 
     @password.setter
     def password(self, pwd: str):
-        """ Setter of a new password: encrypt in SHA256
+        """ Setter of a new password: encrypt in SHA256, by the hashing
+        service
         """
         if pwd is None or type(pwd) is not str:
             self._password = None
         else:
-            self._password = hashlib.sha256(pwd.encode()).hexdigest().lower()
+            self._password = hashing.service().run(self.hash_password, pwd)
+
+    @staticmethod
+    def hash_password(pwd: str) -> str:
+        """ Stored form of a password
+        """
+        return hashlib.sha256(pwd.encode()).hexdigest().lower()
 
     def is_valid_password(self, pwd: str) -> bool:
         """ Validate a password
@@ -40,8 +68,21 @@ class User(Base):
             return False
         if self.password is None:
             return False
-        pwd_e = pwd.encode()
-        return hashlib.sha256(pwd_e).hexdigest().lower() == self.password
+        return hashing.service().run(self.hash_password, pwd) == \
+            self.password
+
+    @property
+    def session_generation(self) -> int:
+        """ Generation of the signed session tokens of the user: tokens
+        of an older generation are revoked
+        """
+        return getattr(self, '_session_generation', None) or 0
+
+    def revoke_sessions(self):
+        """ Revoke every signed session token of the user
+        """
+        self._session_generation = self.session_generation + 1
+        self.save()
 
     def display_name(self) -> str:
         """ Display User name based on email/first_name/last_name
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+""" UserSession module
+"""
+import sys
+from models.base import Base
+
+
+class UserSession(Base):
+    """ Session of a user, stored by SessionDBAuth
+    """
+    __slots__ = ('user_id', 'session_id')
+    # a line appended to the journal per login/logout, instead of a
+    # rewrite of every session (batched by the background flusher when
+    # MODEL_FLUSH_INTERVAL is set)
+    __journal__ = True
+    # session_id identifies a session: every lookup goes through it
+    __indexes__ = ('session_id',)
+
+    def __init__(self, *args: list, **kwargs: dict):
+        """ Initialize a UserSession instance
+        """
+        super().__init__(*args, **kwargs)
+        self.user_id = kwargs.get('user_id')
+        self.session_id = kwargs.get('session_id')
+        # the sessions of a user share one copy of the user ID
+        if type(self.user_id) is str:
+            self.user_id = sys.intern(self.user_id)
+
+    @classmethod
+    def by_session_id(cls, session_id: str) -> 'UserSession':
+        """ Session of a session ID (or None), from the session_id index
+        """
+        if type(session_id) is not str:
+            return None
+        return cls.query().eq('session_id', session_id).first()